@@ -0,0 +1,380 @@
+"""
+G-FIRE Alert Bus
+Local publish/subscribe bus connecting SafeKnob monitors, the dashboard
+and the speak server
+
+Run the broker once per host:
+    python alert_bus.py
+Watch traffic with delivery latency:
+    python alert_bus.py monitor safeknob
+Measure end-to-end delivery latency:
+    python alert_bus.py bench
+"""
+
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+# asyncio is imported by the broker side only: publishers and subscribers
+# use plain sockets and threads, and device loops start faster without it
+
+# Unix socket path where available, loopback (host, port) otherwise (Windows)
+USE_UNIX_SOCKET = hasattr(socket, "AF_UNIX")
+if USE_UNIX_SOCKET:
+    BUS_ADDRESS = os.environ.get(
+        "ALERT_BUS_SOCKET", os.path.join(tempfile.gettempdir(), "gfire_alert_bus.sock")
+    )
+else:
+    BUS_ADDRESS = ("127.0.0.1", int(os.environ.get("ALERT_BUS_PORT", "8765")))
+
+SUBSCRIBER_QUEUE_SIZE = 256  # frames buffered per subscriber before old ones drop
+RECONNECT_DELAY = 1.0        # seconds between reconnect attempts
+LATENCY_SAMPLES = 1000       # delivery latencies kept per client
+
+# Topics
+TOPIC_SAFEKNOB_LEVEL = "safeknob.level"
+TOPIC_SAFEKNOB_ALERT = "safeknob.alert"
+TOPIC_SPEAK = "gfire.speak"
+
+
+@dataclass
+class Alert:
+    """One message on the bus"""
+    topic: str
+    level: str
+    source: str
+    message: str = ""
+    data: dict = field(default_factory=dict)
+    sent_ns: int = 0
+
+    def encode(self):
+        """Wire frame: 'PUB <topic> <json>\\n', so the broker routes without parsing JSON"""
+        payload = json.dumps({
+            "level": self.level,
+            "source": self.source,
+            "message": self.message,
+            "data": self.data,
+            "sent_ns": self.sent_ns
+        }, ensure_ascii=False, separators=(",", ":"))
+        return f"PUB {self.topic} {payload}\n".encode("utf-8")
+
+    @classmethod
+    def decode(cls, line):
+        _, topic, payload = line.decode("utf-8").rstrip("\n").split(" ", 2)
+        return cls(topic=topic, **json.loads(payload))
+
+
+def topic_matches(subscriptions, topic):
+    """'safeknob' matches 'safeknob' and 'safeknob.level'; '*' matches everything"""
+    for sub in subscriptions:
+        if sub == "*" or topic == sub or topic.startswith(sub + "."):
+            return True
+    return False
+
+
+class AlertBroker:
+    """Routes published frames to every subscriber of a matching topic"""
+
+    def __init__(self, address=BUS_ADDRESS, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.address = address
+        self.queue_size = queue_size
+        self.subscribers = {}
+        self.dropped = 0
+
+    async def serve(self, ready=None):
+        import asyncio
+
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            server = await asyncio.start_unix_server(self.handle_client, self.address)
+        else:
+            server = await asyncio.start_server(self.handle_client, *self.address)
+        print(f"Alert bus listening on {self.address}")
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    async def handle_client(self, reader, writer):
+        import asyncio
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        sender = asyncio.create_task(self._send_loop(writer, queue))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b"PUB "):
+                    topic = line[4:line.index(b" ", 4)].decode("utf-8")
+                    self.route(topic, line)
+                elif line.startswith(b"SUB "):
+                    topics = tuple(line[4:].decode("utf-8").split())
+                    current = self.subscribers.get(writer, ((), queue))[0]
+                    self.subscribers[writer] = (current + topics, queue)
+        except (ConnectionError, ValueError) as e:
+            print(f"Alert bus client error: {e}")
+        finally:
+            self.subscribers.pop(writer, None)
+            sender.cancel()
+            writer.close()
+
+    def route(self, topic, line):
+        for topics, queue in self.subscribers.values():
+            if topic_matches(topics, topic):
+                if queue.full():
+                    # Slow subscriber: drop its oldest frame rather than stall the bus
+                    queue.get_nowait()
+                    self.dropped += 1
+                queue.put_nowait(line)
+
+    async def _send_loop(self, writer, queue):
+        try:
+            while True:
+                writer.write(await queue.get())
+                # Coalesce whatever else is already queued into the same write
+                while not queue.empty():
+                    writer.write(queue.get_nowait())
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+
+class AlertBus:
+    """Connection to the local broker; safe to use from any thread.
+
+    Publishing never blocks on a missing broker: the alert is dropped and
+    a reconnect is attempted on the next publish. Subscriptions run on a
+    background thread that reconnects on its own and calls each handler
+    with the decoded Alert.
+    """
+
+    def __init__(self, source, address=BUS_ADDRESS):
+        self.source = source
+        self.address = address
+        self.handlers = []
+        self.latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.received = 0
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._reader = None
+        self._closed = False
+        self._warned = False
+
+    def _open_socket(self):
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.address)
+        else:
+            sock = socket.create_connection(self.address, timeout=1.0)
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _connect(self):
+        """Open the connection and replay subscriptions; returns the socket or None"""
+        try:
+            sock = self._open_socket()
+        except OSError as e:
+            if not self._warned:
+                print(f"Alert bus unavailable: {e}")
+                self._warned = True
+            return None
+
+        topics = sorted({topic for topics, _ in self.handlers for topic in topics})
+        if topics:
+            sock.sendall(f"SUB {' '.join(topics)}\n".encode("utf-8"))
+        self._sock = sock
+        self._warned = False
+        return sock
+
+    def publish(self, topic, level, message="", **data):
+        """Send an alert; returns False if the broker could not be reached"""
+        alert = Alert(topic, level, self.source, message, data, time.time_ns())
+        frame = alert.encode()
+        with self._send_lock:
+            if self._sock is None and self._connect() is None:
+                return False
+            try:
+                self._sock.sendall(frame)
+                return True
+            except OSError as e:
+                print(f"Alert bus publish error: {e}")
+                self._drop_socket()
+                return False
+
+    def subscribe(self, topics, handler):
+        """Call `handler(alert)` for every alert on `topics` (reader thread)"""
+        self.handlers.append((tuple(topics), handler))
+        with self._send_lock:
+            if self._sock is not None:
+                try:
+                    self._sock.sendall(f"SUB {' '.join(topics)}\n".encode("utf-8"))
+                except OSError:
+                    self._drop_socket()
+        if self._reader is None:
+            self._reader = threading.Thread(target=self._read_loop, daemon=True)
+            self._reader.start()
+
+    def _drop_socket(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _read_loop(self):
+        while not self._closed:
+            with self._send_lock:
+                sock = self._sock or self._connect()
+            if sock is None:
+                time.sleep(RECONNECT_DELAY)
+                continue
+
+            try:
+                for line in sock.makefile("rb"):
+                    self._dispatch(line)
+            except (OSError, ValueError):
+                pass
+            with self._send_lock:
+                if self._sock is sock:
+                    self._drop_socket()
+
+    def _dispatch(self, line):
+        try:
+            alert = Alert.decode(line)
+        except (ValueError, TypeError) as e:
+            print(f"Alert bus decode error: {e}")
+            return
+
+        self.received += 1
+        self.latencies_ms.append((time.time_ns() - alert.sent_ns) / 1e6)
+        for topics, handler in self.handlers:
+            if topic_matches(topics, alert.topic):
+                try:
+                    handler(alert)
+                except Exception as e:
+                    print(f"Alert handler error: {e}")
+
+    def latency_summary(self):
+        """Delivery latency percentiles (ms) over the most recent alerts"""
+        samples = sorted(self.latencies_ms)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "p50": samples[len(samples) // 2],
+            "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+            "max": samples[-1]
+        }
+
+    def close(self):
+        self._closed = True
+        with self._send_lock:
+            if self._sock is not None:
+                try:
+                    self._sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self._drop_socket()
+
+
+def run_broker():
+    import asyncio
+
+    try:
+        asyncio.run(AlertBroker().serve())
+    except KeyboardInterrupt:
+        print("\nAlert bus stopped")
+
+
+def run_monitor(topics):
+    bus = AlertBus("monitor")
+
+    def show(alert):
+        latency_ms = (time.time_ns() - alert.sent_ns) / 1e6
+        print(f"[{alert.topic}] {alert.level.upper()} from {alert.source}: "
+              f"{alert.message} {alert.data} ({latency_ms:.2f} ms)")
+
+    bus.subscribe(topics or ["*"], show)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        bus.close()
+
+
+def run_bench(count, interval):
+    """Publish `count` alerts through an in-process broker and report latency"""
+    import asyncio
+
+    if USE_UNIX_SOCKET:
+        address = os.path.join(tempfile.gettempdir(), f"gfire_alert_bench_{os.getpid()}.sock")
+    else:
+        address = (BUS_ADDRESS[0], BUS_ADDRESS[1] + 1)
+
+    ready = threading.Event()
+    broker_thread = threading.Thread(
+        target=lambda: asyncio.run(AlertBroker(address).serve(ready)), daemon=True
+    )
+    broker_thread.start()
+    ready.wait()
+
+    received = threading.Event()
+    subscriber = AlertBus("bench-subscriber", address)
+    subscriber.subscribe(
+        ["bench"],
+        lambda alert: received.set() if alert.data.get("seq") == count - 1 else None
+    )
+    # Wait until the subscription is registered before timing anything
+    while subscriber._sock is None:
+        time.sleep(0.01)
+    time.sleep(0.1)
+
+    publisher = AlertBus("bench-publisher", address)
+    for seq in range(count):
+        publisher.publish("bench.ping", "safe", seq=seq)
+        if interval:
+            time.sleep(interval)
+    received.wait(timeout=10)
+
+    summary = subscriber.latency_summary()
+    print(f"Delivered {subscriber.received}/{count} alerts")
+    if summary["count"]:
+        print(f"Latency p50 {summary['p50']:.3f} ms | p99 {summary['p99']:.3f} ms | "
+              f"max {summary['max']:.3f} ms")
+    publisher.close()
+    subscriber.close()
+    if isinstance(address, str) and os.path.exists(address):
+        os.unlink(address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="G-FIRE local alert bus")
+    subparsers = parser.add_subparsers(dest="command")
+    monitor = subparsers.add_parser("monitor", help="print alerts as they arrive")
+    monitor.add_argument("topics", nargs="*")
+    bench = subparsers.add_parser("bench", help="measure delivery latency")
+    bench.add_argument("--count", type=int, default=1000)
+    bench.add_argument("--interval", type=float, default=0.001,
+                       help="seconds between alerts (0 for a burst)")
+    args = parser.parse_args()
+
+    if args.command == "monitor":
+        run_monitor(args.topics)
+    elif args.command == "bench":
+        run_bench(args.count, args.interval)
+    else:
+        run_broker()
+
+
+if __name__ == "__main__":
+    main()
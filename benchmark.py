@@ -0,0 +1,383 @@
+"""
+G-FIRE Micro-benchmarks
+Offline timings for the hot paths of every module, compared against a
+saved JSON baseline
+
+    python benchmark.py                 # run and compare with the baseline
+    python benchmark.py --save          # run and store as the new baseline
+    python benchmark.py -k api          # only benchmarks whose name contains 'api'
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BASELINE_FILE = "benchmark_baseline.json"
+REGRESSION_THRESHOLD = 0.20  # flag results more than 20% slower than baseline
+LOG_SIZES = [100, 1000, 10000]
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress prints of the code under test"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(fn, number, repeat=5):
+    """Per-call time of `fn` in microseconds, best/median over `repeat` runs"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter_ns() - start) / number / 1000)
+    return {
+        "best_us": min(runs),
+        "median_us": statistics.median(runs),
+        "ops_per_s": 1e6 / statistics.median(runs)
+    }
+
+
+def make_log(count, start=1_700_000_000.0):
+    levels = ["safe", "warning", "danger"]
+    return [{
+        "timestamp": start + i,
+        "temperature": 20 + (i % 50),
+        "light_level": 40 + (i % 30),
+        "safety_level": levels[i % 3],
+        "readable_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start + i))
+    } for i in range(count)]
+
+
+class FakeIMU:
+    acceleration_y = 1.0
+
+
+class FakeButton:
+    pressed = False
+
+
+class FakeSpeaker:
+    def set_tune(self, frequency, volume):
+        pass
+
+    def reset(self):
+        pass
+
+
+class StubTTS:
+    """Stands in for gTTS: writes a tiny file instead of calling Google"""
+
+    def __init__(self, text, lang):
+        self.text = text
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.text.encode("utf-8"))
+
+
+@benchmark
+def safeknob_assess_safety_level(results):
+    from safeknob_app import SafeKnobApp
+
+    app = SafeKnobApp()
+    rng = random.Random(0)
+    samples = [(rng.uniform(10, 70), rng.uniform(0, 100)) for _ in range(100_000)]
+
+    def run():
+        assess = app.assess_safety_level
+        for temperature, light_level in samples:
+            assess(temperature, light_level)
+
+    stats = measure(run, number=1, repeat=5)
+    # Report per sample, not per 100k-sample sweep
+    results["safeknob_app.assess_safety_level"] = {
+        key: value / len(samples) if key.endswith("_us") else value * len(samples)
+        for key, value in stats.items()
+    }
+
+
+@benchmark
+def safeknob_log_reading(results):
+    from safeknob_app import SafeKnobApp, SafetyLevel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = SafeKnobApp()
+        app.log_file = os.path.join(tmp, "safeknob_log.json")
+        # Start from a full log so every call pays the 100-entry rewrite
+        with open(app.log_file, 'w') as f:
+            json.dump(make_log(100), f)
+        results["safeknob_app.log_reading"] = measure(
+            lambda: app.log_reading(42.0, 55, SafetyLevel.WARNING), number=200
+        )
+
+
+@benchmark
+def web_api(results):
+    from fastapi.testclient import TestClient
+    import safeknob_web
+
+    client = TestClient(safeknob_web.app)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in LOG_SIZES:
+            log_file = os.path.join(tmp, f"log_{size}.json")
+            with open(log_file, 'w') as f:
+                json.dump(make_log(size), f)
+            safeknob_web.log_cache = safeknob_web.LogCache(log_file)
+
+            results[f"safeknob_web./api/status[{size}]"] = measure(
+                lambda: client.get("/api/status"), number=200
+            )
+            results[f"safeknob_web./api/logs[{size}]"] = measure(
+                lambda: client.get("/api/logs"), number=50
+            )
+            results[f"safeknob_web./api/logs?limit=10[{size}]"] = measure(
+                lambda: client.get("/api/logs?limit=10"), number=200
+            )
+
+            def reload():
+                # Touch the file so the next request re-parses it
+                os.utime(log_file, ns=(time.time_ns(), time.time_ns()))
+                client.get("/api/status")
+
+            results[f"safeknob_web./api/status reload[{size}]"] = measure(reload, number=20)
+
+
+@benchmark
+def web_ingest(results):
+    import safeknob_web
+
+    batch_size = 1000
+    now = time.time()
+
+    def batch(offset):
+        return {
+            "door": [f"door-{i % 200:03d}" for i in range(batch_size)],
+            "timestamp": [now - 3600 + offset + i / batch_size for i in range(batch_size)],
+            "temperature": [20 + i % 50 for i in range(batch_size)],
+            "light_level": [40 + i % 30 for i in range(batch_size)],
+            "safety_level": ["safe", "warning", "danger"] * (batch_size // 3) + ["safe"] * (batch_size % 3)
+        }
+
+    payload = batch(0)
+    results["safeknob_web.validate_readings[1000]"] = measure(
+        lambda: safeknob_web.validate_readings(payload, now), number=20
+    )
+
+    # Apply batches on top of a full remote buffer
+    cache = safeknob_web.LogCache(None)
+    offset = [0]
+
+    def ingest():
+        offset[0] += 1
+        entries, _ = safeknob_web.validate_readings(batch(offset[0]), now)
+        cache.ingest(entries)
+
+    for _ in range(safeknob_web.MAX_REMOTE_ENTRIES // batch_size):
+        ingest()
+    results["safeknob_web.ingest[1000 into 100k]"] = measure(ingest, number=20)
+
+
+@benchmark
+def server_speak(results):
+    from fastapi.testclient import TestClient
+    import server
+
+    original = server.play_audio_cross_platform
+    server.play_audio_cross_platform = lambda audio_file, trace_id=None, on_start=None: True
+    try:
+        client = TestClient(server.app)
+        with quiet():
+            results["server./speak"] = measure(lambda: client.post("/speak/0"), number=200)
+    finally:
+        server.play_audio_cross_platform = original
+
+
+@benchmark
+def server_speak_text(results):
+    from fastapi.testclient import TestClient
+    import server
+    import tts_cache
+
+    original_play, original_cache = server.play_audio_cross_platform, server.speech_cache
+    server.play_audio_cross_platform = lambda audio_file, trace_id=None, on_start=None: True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            server.speech_cache = tts_cache.SpeechCache(tts_cache.OfflineEngine(), directory=tmp)
+            client = TestClient(server.app)
+            body = {"slots": {"door": 3, "temperature": 62}}
+            with quiet():
+                server.speech_cache.prerender()
+                results["server./speak/text cached"] = measure(
+                    lambda: client.post("/speak/text", json={"text": "3번 문 온도 62도"}), number=200
+                )
+                results["server./speak/template cached"] = measure(
+                    lambda: client.post("/speak/template/door_temperature", json=body), number=200
+                )
+    finally:
+        server.play_audio_cross_platform, server.speech_cache = original_play, original_cache
+
+
+@benchmark
+def telemetry_batches(results):
+    import math
+    import telemetry
+
+    class SineIMU:
+        def __getattr__(self, name):
+            return math.sin(time.time())
+
+    class IdleButton:
+        pressed = False
+
+    sampler = telemetry.TelemetrySampler(SineIMU(), IdleButton())
+    results["telemetry.sample"] = measure(sampler.sample, number=2000)
+
+    # One second of samples at the default rate, packed and read back
+    sampler.drain()
+    for _ in range(int(telemetry.SAMPLE_RATE)):
+        sampler.sample()
+    t0, columns = sampler._t0, sampler._columns
+    results["telemetry.encode_batch[1s]"] = measure(
+        lambda: telemetry.encode_batch(t0, columns), number=200
+    )
+    batch = telemetry.encode_batch(t0, columns)
+    results["telemetry.batch_spans[1s]"] = measure(lambda: telemetry.batch_spans(batch), number=2000)
+
+
+@benchmark
+def client_fsm_tick(results):
+    import client
+    from button_events import ButtonWatcher
+    from server_pool import ServerPool
+
+    servers = ServerPool(["http://127.0.0.1:9"])
+    simulation = client.Simulation(servers, FakeIMU(), ButtonWatcher(FakeButton()), FakeSpeaker())
+    simulation.is_beeping = True
+    simulation.beep_time = time.time() + 3600  # keep the locator beep (and its sleep) off
+
+    with quiet():
+        results["client.Simulation.tick"] = measure(simulation.tick, number=2000)
+
+
+@benchmark
+def server_prepare_all_sounds(results):
+    import server
+
+    original_dir, original_tts = server.AUDIO_DIR, server.gTTS
+    server.gTTS = StubTTS
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            server.AUDIO_DIR = tmp
+
+            def cold():
+                for name in os.listdir(tmp):
+                    os.unlink(os.path.join(tmp, name))
+                server.prepare_all_sounds()
+
+            with quiet():
+                results["server.prepare_all_sounds cold"] = measure(cold, number=20)
+                results["server.prepare_all_sounds warm"] = measure(
+                    server.prepare_all_sounds, number=200
+                )
+    finally:
+        server.AUDIO_DIR, server.gTTS = original_dir, original_tts
+
+
+@benchmark
+def role_import_times(results):
+    """Cold import of every gfire.py role, each in a fresh interpreter"""
+    import gfire
+
+    for module in dict.fromkeys(gfire.ROLE_MODULES.values()):
+        try:
+            runs = [gfire.import_times(module)[0] for _ in range(3)]
+        except RuntimeError:
+            continue  # a dependency of this role is not installed here
+        results[f"import {module}"] = {
+            "best_us": min(runs),
+            "median_us": statistics.median(runs),
+            "ops_per_s": 1e6 / statistics.median(runs)
+        }
+
+
+def compare(results, baseline):
+    """Print a table against the baseline; returns names that regressed.
+
+    Compares best-of-runs times, which are far less sensitive to
+    scheduler noise than medians on a shared machine.
+    """
+    regressions = []
+    print(f"{'benchmark':<48}{'best':>12}{'baseline':>12}{'change':>10}")
+    for name, stats in results.items():
+        current = stats["best_us"]
+        base = baseline.get(name, {}).get("best_us")
+        if base:
+            change = (current - base) / base
+            flag = " !" if change > REGRESSION_THRESHOLD else ""
+            if flag:
+                regressions.append(name)
+            print(f"{name:<48}{current:>10.2f}us{base:>10.2f}us{change:>+9.1%}{flag}")
+        else:
+            print(f"{name:<48}{current:>10.2f}us{'-':>12}{'new':>10}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="G-FIRE micro-benchmarks")
+    parser.add_argument("-k", dest="keyword", help="run benchmarks whose name contains this")
+    parser.add_argument("--save", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    # Keep the alert bus and tracing quiet and local
+    os.environ.setdefault("ALERT_BUS_SOCKET", os.path.join(tempfile.gettempdir(), "gfire_bench_none.sock"))
+    os.environ.pop("GFIRE_TRACE_FILE", None)
+
+    results = {}
+    for bench in BENCHMARKS:
+        if args.keyword and args.keyword not in bench.__name__:
+            continue
+        print(f"Running {bench.__name__}...")
+        try:
+            with quiet():
+                bench(results)
+        except ImportError as e:
+            print(f"  skipped: {e}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f).get("results", {})
+    regressions = compare(results, baseline)
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "saved_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "results": baseline
+            }, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {REGRESSION_THRESHOLD:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
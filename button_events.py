@@ -0,0 +1,146 @@
+"""
+G-FIRE Button Events
+Edge-triggered capture of MODI+ button presses on a dedicated thread
+
+The state machine used to sample `button.clicked` once per loop, so a
+press during a pause or a speak request was missed or handled late.
+ButtonWatcher polls `pressed` much faster than the module reports it and
+turns the edges into timestamped events in a deque. The state machine
+drains it whenever it is ready, so presses wait instead of being lost.
+
+Events, all stamped with time.monotonic():
+    press         button went down
+    click         released before LONG_PRESS
+    double_click  a click within DOUBLE_CLICK_WINDOW of the previous
+                  one (the second click is also delivered as a click)
+    long_press    held for LONG_PRESS; fired while still held
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from loop_profiler import Histogram
+
+POLL_RATE = float(os.environ.get("GFIRE_BUTTON_HZ", "500"))
+# Module-side report rate: every (100 - n) * 11 ms, so 99 -> 11 ms (modi_plus default 91 -> 99 ms)
+REPORT_FREQUENCY = 99
+LONG_PRESS = 0.8            # seconds held for a long press
+DOUBLE_CLICK_WINDOW = 0.4   # seconds between releases of a double click
+MAX_EVENTS = 256            # oldest events dropped beyond this if nobody drains
+
+
+class ButtonEvent:
+    __slots__ = ("kind", "at", "pressed_at")
+
+    def __init__(self, kind, at, pressed_at):
+        self.kind = kind              # "press", "click", "double_click" or "long_press"
+        self.at = at                  # when the edge completing the gesture was seen
+        self.pressed_at = pressed_at  # when the button went down
+
+    def __repr__(self):
+        return f"ButtonEvent({self.kind}, held {(self.at - self.pressed_at) * 1000:.0f} ms)"
+
+
+class ButtonWatcher(threading.Thread):
+    """Watches one MODI+ button and queues its events.
+
+    Only this thread appends and only the state machine pops, and deque
+    append/popleft are atomic, so the queue needs no lock.
+    """
+
+    def __init__(self, button, poll_rate=POLL_RATE):
+        super().__init__(daemon=True)
+        self.button = button
+        self.interval = 1.0 / poll_rate
+        if hasattr(button, "prop_samp_freq"):
+            # Applies when the button property is first requested
+            button.prop_samp_freq = REPORT_FREQUENCY
+        self.counts = {"press": 0, "click": 0, "double_click": 0, "long_press": 0}
+        self.errors = 0
+        self.press_to_reaction = Histogram()  # button down -> state machine acted (ms)
+        self.event_to_reaction = Histogram()  # gesture complete -> state machine acted (ms)
+        self._events = deque(maxlen=MAX_EVENTS)
+        self._arrived = threading.Event()
+        self._stop_event = threading.Event()
+        self._pressed_at = None
+        self._long_sent = False
+        self._last_click = None
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                pressed = self.button.pressed
+            except Exception as e:
+                # A slow or missing report; try again next poll
+                self.errors += 1
+                if self.errors == 1:
+                    print(f"\nButton read error: {e}")
+                continue
+            self.update(pressed, time.monotonic())
+
+    def update(self, pressed, now):
+        """Feeds one sample of the button state"""
+        if pressed:
+            if self._pressed_at is None:
+                self._pressed_at = now
+                self._long_sent = False
+                self._emit("press", now, now)
+            elif not self._long_sent and now - self._pressed_at >= LONG_PRESS:
+                self._long_sent = True
+                self._emit("long_press", now, self._pressed_at)
+            return
+
+        if self._pressed_at is None:
+            return
+        pressed_at, self._pressed_at = self._pressed_at, None
+        if self._long_sent:
+            self._last_click = None
+            return
+        if self._last_click is not None and now - self._last_click <= DOUBLE_CLICK_WINDOW:
+            self._emit("double_click", now, pressed_at)
+            self._last_click = None
+        else:
+            self._last_click = now
+        self._emit("click", now, pressed_at)
+
+    def _emit(self, kind, at, pressed_at):
+        self.counts[kind] += 1
+        self._events.append(ButtonEvent(kind, at, pressed_at))
+        self._arrived.set()
+
+    def take(self, kinds=("click",)):
+        """Oldest queued event of one of `kinds`, or None. Older events of
+        other kinds are discarded; newer ones stay queued."""
+        events = self._events
+        while events:
+            event = events.popleft()
+            if event.kind in kinds:
+                return event
+        return None
+
+    def handled(self, event):
+        """Records the press-to-reaction latency of an event acted upon"""
+        now = time.monotonic()
+        self.press_to_reaction.add((now - event.pressed_at) * 1000)
+        self.event_to_reaction.add((now - event.at) * 1000)
+
+    def wait(self, timeout):
+        """Sleeps up to `timeout` seconds, returning early (True) once an event is queued"""
+        self._arrived.clear()
+        if self._events:
+            return True
+        return self._arrived.wait(timeout)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def summary(self):
+        counts = " ".join(f"{kind}={count}" for kind, count in self.counts.items())
+        reaction = self.event_to_reaction
+        press = self.press_to_reaction
+        return (f"[button] {counts} errors={self.errors} | "
+                f"event->reaction p50<={reaction.percentile(0.5):g} "
+                f"p99<={reaction.percentile(0.99):g} max={reaction.max:.1f} ms | "
+                f"press->reaction p50<={press.percentile(0.5):g} max={press.max:.1f} ms")
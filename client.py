@@ -1,51 +1,98 @@
 import time
-import requests
-import modi_plus
+PROCESS_START = time.monotonic()
+
 import json
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from button_events import ButtonWatcher
+from discovery import discover_all
+from latency_trace import Tracer, new_trace_id
+from loop_profiler import LoopProfiler
+
+# modi_topology (modi_plus), server_pool and telemetry (requests) are
+# imported in main(), where they overlap with MODI+ and server discovery
 
 CONFIG_FILE = "client_config.json"
+SERVER_URLS_OVERRIDE = [url.strip() for url in os.environ.get("GFIRE_SERVER_URL", "").split(",")
+                        if url.strip()]
+SERVER_URL_TTL = 3600.0      # seconds confirmed addresses are used without checking first
+TELEMETRY_ENABLED = os.environ.get("GFIRE_TELEMETRY", "1") != "0"
 
-def get_server_url():
-    """
-    Gets the server URL. Tries to load from a config file first,
-    otherwise prompts the user and saves it for next time.
-    """
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                saved_url = config.get("server_url")
-                if saved_url:
-                    use_saved = input(f"Found saved server URL: {saved_url}. Use it? (Y/n): ").lower().strip()
-                    if use_saved in ['', 'y', 'yes']:
-                        return saved_url
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Warning: Could not read config file. {e}")
-
-    # Prompt for new URL if not found or not used
-    server_url = input("Enter the full server address (e.g., http://192.168.1.10:8000 or https://your-ngrok-url.io): ")
-    
-    # Save the new URL
+tracer = Tracer("client")
+
+def load_config():
+    if not os.path.exists(CONFIG_FILE):
+        return {}
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Warning: Could not read config file. {e}")
+        return {}
+
+def save_server_urls(server_urls):
+    """Caches the server addresses with the time they were last confirmed."""
+    config = load_config()
+    config.pop("server_url", None)
+    config.update({"server_urls": server_urls, "confirmed_at": time.time()})
     try:
         with open(CONFIG_FILE, 'w') as f:
-            json.dump({"server_url": server_url}, f)
-        print(f"Server URL saved to {CONFIG_FILE} for future use.")
+            json.dump(config, f)
     except IOError as e:
         print(f"Warning: Could not save config file. {e}")
-        
-    return server_url
 
-def call_speak_endpoint(base_url, index):
-    """Calls the server's speak endpoint."""
-    try:
-        url = f"{base_url}/speak/{index}"
-        print(f"Calling endpoint: {url}")
-        response = requests.post(url, timeout=None)
-        response.raise_for_status()
-        print("Server acknowledged speak request.")
-    except requests.exceptions.RequestException as e:
-        print(f"Error calling speak endpoint: {e}")
+def get_server_urls():
+    """
+    Finds the speak servers without user input. Returns (urls, source).
+
+    Order: GFIRE_SERVER_URL (comma separated), the cached addresses while
+    younger than SERVER_URL_TTL, LAN discovery, then the stale cached
+    addresses. Only an interactive session with nothing found is asked
+    for an address; a headless device keeps discovering until a server
+    answers.
+    """
+    if SERVER_URLS_OVERRIDE:
+        return SERVER_URLS_OVERRIDE, "env"
+
+    config = load_config()
+    cached_urls = config.get("server_urls") or ([config["server_url"]] if config.get("server_url") else [])
+    if cached_urls and time.time() - config.get("confirmed_at", 0) < SERVER_URL_TTL:
+        # Trusted without a round trip; the server pool probes them in the background
+        return cached_urls, "cache"
+
+    attempt = 0
+    while True:
+        attempt += 1
+        server_urls = discover_all()
+        if server_urls:
+            save_server_urls(server_urls)
+            return server_urls, "discovery"
+        if cached_urls:
+            print(f"No server answered discovery; trying last known {', '.join(cached_urls)}")
+            return cached_urls, "stale cache"
+        if sys.stdin.isatty():
+            server_url = input("No server found. Enter the server address (e.g., http://192.168.1.10:8000): ").strip()
+            if server_url:
+                save_server_urls([server_url])
+                return [server_url], "manual"
+        else:
+            print(f"Discovery attempt {attempt}: no server found, retrying...")
+
+def detect_event(state, pressed_at=None):
+    """Starts a latency trace for an input event seen in the given state.
+
+    `pressed_at` (time.monotonic() of the button press) backdates detect
+    to the press, so time the click spent queued shows up in the report.
+    """
+    trace_id = new_trace_id()
+    ts_ns = None
+    if pressed_at is not None:
+        ts_ns = time.time_ns() - int((time.monotonic() - pressed_at) * 1e9)
+    tracer.mark(trace_id, "detect", ts_ns=ts_ns, state=state)
+    return trace_id
 
 # -- State and Thresholds from main.py --
 class State:
@@ -67,125 +114,226 @@ SHAKE_ACCELERATION_THRESHOLD = 3
 AIM_ANGLE_THRESHOLD = 45
 PICK_UP_ACCELERATION_THRESHOLD = 35
 
+class Simulation:
+    """Extinguisher coaching state machine driven by the MODI+ modules."""
+
+    def __init__(self, servers, imu, buttons, speaker, profiler=None, telemetry=None):
+        self.servers = servers
+        self.profiler = profiler or LoopProfiler("client", period=0.1)
+        self.telemetry = telemetry
+        self.imu = imu
+        self.buttons = buttons
+        self.speaker = speaker
+        self.current_state = State.FIND_EXTINGUISHER
+        self.is_beeping = False
+        self.beep_time = 0
+        self.voice_played = False
+
+    def speak(self, index, event=None):
+        """Asks the best speak server to play a message, timed as network phase.
+        `event` is the button event that triggered it, if any."""
+        pressed_at = event.pressed_at if event is not None else None
+        with self.profiler.phase("network"):
+            with self.telemetry.speaking() if self.telemetry else nullcontext():
+                self.servers.speak(index, detect_event(self.current_state, pressed_at))
+
+    def clicked(self):
+        """Takes the next queued click (or None), including ones made during a pause or speak request."""
+        event = self.buttons.take()
+        if event is not None:
+            self.buttons.handled(event)
+        return event
+
+    def pause(self, seconds):
+        """Intentional wait between coaching steps; not counted as busy time."""
+        with self.profiler.phase("pause", idle=True):
+            time.sleep(seconds)
+
+    def tick(self):
+        """Runs one iteration of the state machine."""
+        # -- State Logic --
+        if self.current_state == State.FIND_EXTINGUISHER:
+            print("FIND_EXTINGUISHER mode. Press button to locate.", end='\r')
+            if self.clicked():
+                print("\nButton clicked! Activating locator beep.")
+                self.is_beeping = True
+                self.beep_time = time.time()
+
+            if self.is_beeping:
+                if time.time() - self.beep_time > 0.5:
+                    with self.profiler.phase("actuate"):
+                        self.speaker.set_tune(1500, 100)
+                        time.sleep(0.1)
+                        self.speaker.reset()
+                    self.beep_time = time.time()
+
+                acc_y = self.imu.acceleration_y
+                print(f"\rAcc Y: {acc_y:.2f} (threshold: {PICK_UP_ACCELERATION_THRESHOLD})", end="")
+                if abs(acc_y) > PICK_UP_ACCELERATION_THRESHOLD:
+                    print("\nExtinguisher picked up!")
+                    self.is_beeping = False
+                    self.speaker.reset()
+                    self.current_state = State.START
+                    self.pause(1)
+
+        elif self.current_state == State.START:
+            if not self.voice_played:
+                self.speak(0)
+                self.voice_played = True
+                print("Press button to proceed to next step.")
+            if self.clicked():
+                print("Button clicked! Moving to next step.")
+                self.current_state = State.ROTATE_TO_BREAK_TIE
+                self.voice_played = False
+                self.pause(1)
+
+        elif self.current_state == State.ROTATE_TO_BREAK_TIE:
+            print("Press button to rotate and break the tie.")
+            event = self.clicked()
+            if event:
+                print("Button clicked! Tie broken.")
+                self.speak(1, event)
+                self.current_state = State.PLACE_ON_FLOOR
+                self.pause(2)
+
+        elif self.current_state == State.PLACE_ON_FLOOR:
+            print("Press button to place on floor.")
+            event = self.clicked()
+            if event:
+                print("Button clicked! Placed on floor.")
+                self.speak(2, event)
+                self.current_state = State.PULL_PIN
+                self.pause(2)
+
+        elif self.current_state == State.PULL_PIN:
+            print("Press button to pull the pin.")
+            event = self.clicked()
+            if event:
+                print("Button clicked! Pin pulled.")
+                self.speak(3, event)
+                self.current_state = State.AIM_NOZZLE
+                self.pause(2)
+
+        elif self.current_state == State.AIM_NOZZLE:
+            print("Press button to aim nozzle.")
+            event = self.clicked()
+            if event:
+                print("Button clicked! Nozzle aimed.")
+                self.speak(4, event)
+                self.current_state = State.SQUEEZE_HANDLE
+                self.pause(3)
+
+        elif self.current_state == State.SQUEEZE_HANDLE:
+            self.speak(5)
+            self.current_state = State.PREPARE_TO_FIRE
+            self.pause(3)
+
+        elif self.current_state == State.PREPARE_TO_FIRE:
+            self.speak(6)
+            self.current_state = State.FIRE
+            self.pause(2)
+
+        elif self.current_state == State.FIRE:
+            self.speak(7)
+            self.current_state = State.EVACUATE
+            self.pause(4)
+
+        elif self.current_state == State.EVACUATE:
+            self.speak(8)
+            self.current_state = State.END
+
+def connect_hardware():
+    """Connects the MODI+ modules; runs while the speak servers are looked up."""
+    from modi_topology import connect_modules
+
+    hardware = connect_modules(("imu", "button", "speaker"))
+    imu = hardware["imu"]
+    hardware.first_reading(lambda: imu.acceleration_y)
+    return hardware
+
 def main():
     """Main simulation loop running on the MODI+ device."""
-    server_base_url = get_server_url()
-    current_state = State.FIND_EXTINGUISHER
+    # -- MODI+ Initialization (in the background) --
+    print("Initializing MODI+ modules...")
+    executor = ThreadPoolExecutor(max_workers=1)
+    hardware_future = executor.submit(connect_hardware)
+
+    server_urls, source = get_server_urls()
+    print(f"Speak servers {', '.join(server_urls)} ({source}), "
+          f"ready {(time.monotonic() - PROCESS_START) * 1000:.0f} ms after start")
+
+    # Probing starts now so latencies are known by the first speak command
+    from server_pool import ServerPool
+
+    pinned = source == "env"
+    uploader = None
+
+    def on_servers_confirmed(server_urls):
+        # Given to the pool before it starts, so the first probe round is saved too
+        if not pinned:
+            save_server_urls(server_urls)
+        if uploader is not None:
+            uploader.set_base_url(server_urls[0])
+
+    servers = ServerPool(server_urls, tracer, rediscover=None if pinned else discover_all,
+                         on_change=on_servers_confirmed)
+    servers.start()
 
-    # -- MODI+ Initialization --
     try:
-        print("Initializing MODI+ modules...")
-        bundle = modi_plus.MODIPlus()
-        imu = bundle.imus[0]
-        button = bundle.buttons[0]
-        speaker = bundle.speakers[0]
-        print("Initialization complete. Starting simulation.")
-        time.sleep(1)
+        hardware = hardware_future.result()
+        imu, button, speaker = hardware["imu"], hardware["button"], hardware["speaker"]
+        print(f"Initialization complete {(time.monotonic() - PROCESS_START) * 1000:.0f} ms "
+              "after start. Starting simulation.")
     except Exception as e:
         print(f"Initialization error: {e}")
         print("Please ensure MODI+ IMU, Button, and Speaker are connected.")
+        servers.stop()
         return
+    finally:
+        executor.shutdown(wait=False)
+
+    # -- Button events (own thread, so no press is lost while the loop is busy) --
+    buttons = ButtonWatcher(button)
+    buttons.start()
 
     # -- State Machine Loop --
-    is_beeping = False
-    beep_time = 0
-    voice_played = False
+    simulation = Simulation(servers, imu, buttons, speaker)
+    profiler = simulation.profiler
+
+    # -- Telemetry --
+    sampler = None
+    if TELEMETRY_ENABLED:
+        from telemetry import TelemetrySampler, TelemetryUploader
+
+        sampler = TelemetrySampler(imu, button, lambda: simulation.current_state)
+        uploader = TelemetryUploader(servers.primary_url, sampler)
+        simulation.telemetry = uploader
+        sampler.start()
+        uploader.start()
+        print(f"Streaming telemetry to {uploader.url}")
     
-    while current_state < State.END:
+    while simulation.current_state < State.END:
         try:
-            # -- State Logic --
-            if current_state == State.FIND_EXTINGUISHER:
-                print("FIND_EXTINGUISHER mode. Press button to locate.", end='\r')
-                if button.clicked:
-                    print("\nButton clicked! Activating locator beep.")
-                    is_beeping = True
-                    beep_time = time.time()
-
-                if is_beeping:
-                    if time.time() - beep_time > 0.5:
-                        speaker.set_tune(1500, 100)
-                        time.sleep(0.1)
-                        speaker.reset()
-                        beep_time = time.time()
-                    
-                    acc_y = imu.acceleration_y
-                    print(f"\rAcc Y: {acc_y:.2f} (threshold: {PICK_UP_ACCELERATION_THRESHOLD})", end="")
-                    if abs(acc_y) > PICK_UP_ACCELERATION_THRESHOLD:
-                        print("\nExtinguisher picked up!")
-                        is_beeping = False
-                        speaker.reset()
-                        current_state = State.START
-                        time.sleep(1)
-
-            elif current_state == State.START:
-                if not voice_played:
-                    call_speak_endpoint(server_base_url, 0)
-                    voice_played = True
-                    print("Press button to proceed to next step.")
-                if button.clicked:
-                    print("Button clicked! Moving to next step.")
-                    current_state = State.ROTATE_TO_BREAK_TIE
-                    voice_played = False
-                    time.sleep(1)
-
-            elif current_state == State.ROTATE_TO_BREAK_TIE:
-                print("Press button to rotate and break the tie.")
-                if button.clicked:
-                    print("Button clicked! Tie broken.")
-                    call_speak_endpoint(server_base_url, 1)
-                    current_state = State.PLACE_ON_FLOOR
-                    time.sleep(2)
-
-            elif current_state == State.PLACE_ON_FLOOR:
-                print("Press button to place on floor.")
-                if button.clicked:
-                    print("Button clicked! Placed on floor.")
-                    call_speak_endpoint(server_base_url, 2)
-                    current_state = State.PULL_PIN
-                    time.sleep(2)
-
-            elif current_state == State.PULL_PIN:
-                print("Press button to pull the pin.")
-                if button.clicked:
-                    print("Button clicked! Pin pulled.")
-                    call_speak_endpoint(server_base_url, 3)
-                    current_state = State.AIM_NOZZLE
-                    time.sleep(2)
-
-            elif current_state == State.AIM_NOZZLE:
-                print("Press button to aim nozzle.")
-                if button.clicked:
-                    print("Button clicked! Nozzle aimed.")
-                    call_speak_endpoint(server_base_url, 4)
-                    current_state = State.SQUEEZE_HANDLE
-                    time.sleep(3)
-
-            elif current_state == State.SQUEEZE_HANDLE:
-                call_speak_endpoint(server_base_url, 5)
-                current_state = State.PREPARE_TO_FIRE
-                time.sleep(3)
-
-            elif current_state == State.PREPARE_TO_FIRE:
-                call_speak_endpoint(server_base_url, 6)
-                current_state = State.FIRE
-                time.sleep(2)
-
-            elif current_state == State.FIRE:
-                call_speak_endpoint(server_base_url, 7)
-                current_state = State.EVACUATE
-                time.sleep(4)
-
-            elif current_state == State.EVACUATE:
-                call_speak_endpoint(server_base_url, 8)
-                current_state = State.END
-
-            time.sleep(0.1)
+            profiler.start_tick()
+            simulation.tick()
+            profiler.end_tick()
+            buttons.wait(0.1)  # wakes early for a button event
 
         except Exception as e:
             print(f"An error occurred in the main loop: {e}")
             # Optional: add reconnection logic here if needed
             break
             
+    print(profiler.summary())
+    buttons.stop()
+    print(buttons.summary())
+    servers.stop()
+    print(servers.summary())
+    if uploader is not None:
+        sampler.stop()
+        uploader.stop()
+        print(f"Telemetry: {uploader.sent_samples} samples sent ({uploader.sent_bytes} bytes), "
+              f"{uploader.dropped_batches} batches dropped, {sampler.overruns} sampler overruns")
     print("Simulation finished.")
 
 if __name__ == "__main__":
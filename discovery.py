@@ -0,0 +1,173 @@
+"""
+G-FIRE Server Discovery
+Zero-touch LAN discovery of the speak server over UDP
+
+The server runs a DiscoveryResponder; clients broadcast a query and take
+the first matching reply, so a device needs no configured address. The
+query also goes to loopback, which makes a server on the same machine
+(and tests) discoverable without a network.
+
+    python discovery.py respond --port 8000   # stand-alone responder
+    python discovery.py probe -n 20           # discovery latency
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+import uuid
+
+SERVICE = "gfire-speak"
+PROTOCOL_VERSION = 1
+DISCOVERY_PORT = int(os.environ.get("GFIRE_DISCOVERY_PORT", "50000"))
+# Where queries are sent; broadcast for the LAN plus loopback for this host
+DISCOVERY_TARGETS = [
+    target.strip() for target in
+    os.environ.get("GFIRE_DISCOVERY_TARGETS", "255.255.255.255,127.0.0.1").split(",")
+    if target.strip()
+]
+DISCOVERY_TIMEOUT = 1.0  # seconds to wait for the first reply
+DISCOVERY_SETTLE = 0.2   # seconds to keep listening for more servers after the first
+QUERY_RETRIES = 3        # queries per discovery, spread over the timeout
+
+
+class DiscoveryResponder(threading.Thread):
+    """Answers discovery queries with the port the HTTP server listens on"""
+
+    def __init__(self, http_port, port=DISCOVERY_PORT, name=None):
+        super().__init__(daemon=True)
+        self.http_port = http_port
+        self.port = port
+        self.name = name or socket.gethostname()
+        # Tells apart servers that share a hostname (e.g. two "raspberrypi" boards)
+        self.instance = uuid.uuid4().hex
+        self.answered = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("", port))
+
+    def run(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except OSError:
+                return  # closed
+            try:
+                query = json.loads(data)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if not isinstance(query, dict) or query.get("service") != SERVICE or "nonce" not in query:
+                continue
+            reply = {
+                "service": SERVICE,
+                "version": PROTOCOL_VERSION,
+                "nonce": query["nonce"],
+                "port": self.http_port,
+                "name": self.name,
+                "instance": self.instance
+            }
+            try:
+                self.sock.sendto(json.dumps(reply).encode("utf-8"), address)
+                self.answered += 1
+            except OSError as e:
+                print(f"Discovery reply failed: {e}")
+
+    def close(self):
+        self.sock.close()
+
+
+def discover(timeout=DISCOVERY_TIMEOUT, targets=None, port=DISCOVERY_PORT):
+    """Base URL of the first server that answers, or None after `timeout`"""
+    found = discover_all(timeout, 0.0, targets, port)
+    return found[0] if found else None
+
+
+def discover_all(timeout=DISCOVERY_TIMEOUT, settle=DISCOVERY_SETTLE, targets=None,
+                 port=DISCOVERY_PORT):
+    """Base URLs of every server that answers, in reply order.
+
+    Waits up to `timeout` for the first reply, then `settle` seconds more
+    for other servers; [] if nobody answers.
+    """
+    targets = targets or DISCOVERY_TARGETS
+    nonce = uuid.uuid4().hex
+    query = json.dumps({"service": SERVICE, "version": PROTOCOL_VERSION, "nonce": nonce})
+    query = query.encode("utf-8")
+    found = []
+    seen = set()
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        deadline = time.monotonic() + timeout
+        resend_interval = timeout / QUERY_RETRIES
+        next_send = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return found
+            if now >= next_send and not found:
+                # UDP may drop a query; repeat it a few times within the timeout
+                for target in targets:
+                    try:
+                        sock.sendto(query, (target, port))
+                    except OSError:
+                        pass  # e.g. no broadcast route on this host
+                next_send = now + resend_interval
+
+            sock.settimeout(max(0.001, min(deadline, next_send) - time.monotonic()))
+            try:
+                data, (host, _) = sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            try:
+                reply = json.loads(data)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if not (isinstance(reply, dict) and reply.get("service") == SERVICE
+                    and reply.get("nonce") == nonce):
+                continue
+            # A server reached by both broadcast and loopback answers twice;
+            # responders without an instance id are told apart by address
+            identity = reply.get("instance") or (host, reply["port"])
+            if identity not in seen:
+                seen.add(identity)
+                found.append(f"http://{host}:{reply['port']}")
+            if len(found) == 1:
+                if settle <= 0:
+                    return found
+                deadline = min(deadline, time.monotonic() + settle)
+                next_send = deadline  # no more queries once someone answered
+
+
+def probe(rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        url = discover()
+        elapsed = (time.perf_counter() - start) * 1000
+        if url is None:
+            print(f"no reply within {DISCOVERY_TIMEOUT:.1f} s")
+            continue
+        samples.append(elapsed)
+        print(f"{url}  {elapsed:.2f} ms")
+    if samples:
+        print(f"found {len(samples)}/{rounds}, median {statistics.median(samples):.2f} ms, "
+              f"max {max(samples):.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="G-FIRE server discovery")
+    parser.add_argument("command", choices=["respond", "probe"])
+    parser.add_argument("--port", type=int, default=8000, help="HTTP port to announce")
+    parser.add_argument("-n", type=int, default=10, help="probe rounds")
+    args = parser.parse_args()
+
+    if args.command == "respond":
+        responder = DiscoveryResponder(args.port)
+        print(f"Answering discovery on UDP {responder.port} for HTTP port {args.port}")
+        responder.run()
+    else:
+        probe(args.n)
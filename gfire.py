@@ -0,0 +1,207 @@
+"""
+G-FIRE Launcher
+One entry point for every G-FIRE and SafeKnob role, importing only what
+the chosen roles need
+
+Service roles share one asyncio loop on a background thread: the alert
+bus starts first, then each web app is imported off the loop and served
+by uvicorn. A device role runs in the main thread at the same time, so
+MODI+ discovery overlaps the web servers' startup, and the speak server
+renders its TTS files in the background while it already answers.
+
+    python gfire.py server bus                  # speak server + alert bus
+    python gfire.py safeknob-app web bus        # a SafeKnob host in one process
+    python gfire.py client                      # extinguisher device
+    python gfire.py importtime [ROLE ...] [--top 8]
+"""
+
+import time
+PROCESS_START = time.monotonic()
+
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# role -> module serving `app` (the bus has no app)
+SERVICE_ROLES = {"bus": "alert_bus", "server": "server", "web": "safeknob_web"}
+# role -> (module, entry point); at most one per process, they own the terminal
+DEVICE_ROLES = {
+    "client": ("client", "main"),
+    "safeknob": ("safeknob", "run_safeknob"),
+    "safeknob-app": ("safeknob_app", "main"),
+}
+ROLE_MODULES = {**SERVICE_ROLES, **{role: module for role, (module, _) in DEVICE_ROLES.items()}}
+
+
+def elapsed_ms():
+    return (time.monotonic() - PROCESS_START) * 1000
+
+
+def service_port(role, module):
+    return module.SERVER_PORT if role == "server" else module.WEB_PORT
+
+
+class ServiceRunner(threading.Thread):
+    """Alert bus and uvicorn servers for the service roles, on one event loop"""
+
+    def __init__(self, roles):
+        super().__init__(daemon=True)
+        self.roles = roles
+        self.servers = []
+        self.failed = None
+        self._loop = None
+        self._bus_task = None
+
+    def run(self):
+        import asyncio
+
+        try:
+            asyncio.run(self._serve())
+        except BaseException as e:  # uvicorn calls sys.exit() when it cannot bind
+            self.failed = e
+
+    async def _serve(self):
+        import asyncio
+
+        self._loop = asyncio.get_running_loop()
+        tasks = []
+        if "bus" in self.roles:
+            from alert_bus import AlertBroker
+
+            ready = asyncio.Event()
+            self._bus_task = asyncio.create_task(AlertBroker().serve(ready))
+            tasks.append(self._bus_task)
+            await ready.wait()
+            print(f"[gfire] bus up {elapsed_ms():.0f} ms after start")
+
+        apps = [role for role in self.roles if role != "bus"]
+        if apps:
+            # Imported off the loop so the bus keeps routing meanwhile
+            uvicorn, *modules = await asyncio.gather(
+                asyncio.to_thread(importlib.import_module, "uvicorn"),
+                *(asyncio.to_thread(importlib.import_module, SERVICE_ROLES[role]) for role in apps)
+            )
+            for role, module in zip(apps, modules):
+                config = uvicorn.Config(module.app, host="0.0.0.0", port=service_port(role, module))
+                server = uvicorn.Server(config)
+                self.servers.append(server)
+                tasks.append(asyncio.create_task(server.serve()))
+                tasks.append(asyncio.create_task(self._report_ready(role, server)))
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _report_ready(self, role, server):
+        import asyncio
+
+        while not server.started:
+            if server.should_exit:
+                return
+            await asyncio.sleep(0.01)
+        print(f"[gfire] {role} up on port {server.config.port} {elapsed_ms():.0f} ms after start")
+
+    def stop(self):
+        for server in self.servers:
+            server.should_exit = True
+        if self._bus_task is not None:
+            self._loop.call_soon_threadsafe(self._bus_task.cancel)
+        self.join(timeout=5)
+
+
+def run(roles):
+    services = [role for role in roles if role in SERVICE_ROLES]
+    devices = [role for role in roles if role in DEVICE_ROLES]
+    runner = None
+    if services:
+        runner = ServiceRunner(services)
+        runner.start()
+
+    try:
+        if devices:
+            module_name, entry = DEVICE_ROLES[devices[0]]
+            getattr(importlib.import_module(module_name), entry)()
+        if runner is not None:
+            while runner.is_alive():
+                runner.join(0.5)
+            if runner.failed is not None:
+                print(f"[gfire] services stopped: {runner.failed!r}")
+    except KeyboardInterrupt:
+        print("\n[gfire] stopping")
+    finally:
+        if runner is not None:
+            runner.stop()
+
+
+def import_times(module):
+    """Imports `module` in a fresh interpreter under -X importtime.
+    Returns (total_us, [(name, cumulative_us)] of its direct imports)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    children = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package", nested imports indented
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == module:
+                return int(cumulative), children
+            children = []
+        elif depth == 1:
+            children.append((name, int(cumulative)))
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def import_report(roles, top):
+    """Prints the cold import time of each role's module and its heaviest imports"""
+    for role in roles:
+        module = ROLE_MODULES[role]
+        try:
+            total_us, children = import_times(module)
+        except RuntimeError as e:
+            print(f"{role:<13} {e}")
+            continue
+        heaviest = sorted(children, key=lambda child: child[1], reverse=True)[:top]
+        print(f"{role:<13} {total_us / 1000:7.1f} ms  import {module}")
+        for name, cumulative in heaviest:
+            print(f"{'':<13} {cumulative / 1000:7.1f} ms    {name}")
+
+
+def main():
+    roles = list(ROLE_MODULES)
+    parser = argparse.ArgumentParser(description="G-FIRE launcher")
+    parser.add_argument("roles", nargs="+", metavar="ROLE",
+                        help=f"{', '.join(roles)}, or `importtime [ROLE ...]`")
+    parser.add_argument("--top", type=int, default=8,
+                        help="importtime: heaviest direct imports listed per role")
+    args = parser.parse_args()
+
+    if args.roles[0] == "importtime":
+        requested = args.roles[1:] or roles
+    else:
+        requested = args.roles
+    unknown = [role for role in requested if role not in ROLE_MODULES]
+    if unknown:
+        parser.error(f"unknown role(s): {', '.join(unknown)} (choose from {', '.join(roles)})")
+
+    if args.roles[0] == "importtime":
+        import_report(requested, args.top)
+        return
+    if sum(role in DEVICE_ROLES for role in requested) > 1:
+        parser.error("run at most one device role (client, safeknob, safeknob-app) per process")
+    run(list(dict.fromkeys(requested)))
+
+
+if __name__ == "__main__":
+    main()
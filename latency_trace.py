@@ -0,0 +1,139 @@
+"""
+G-FIRE Latency Tracing
+Stage timestamps from button press to first audio sample, correlated by
+a trace id that the client sends to the server in the X-Trace-Id header
+
+Enable by pointing GFIRE_TRACE_FILE at a JSON-lines file on each host,
+then merge and summarize:
+    python latency_trace.py client_trace.jsonl server_trace.jsonl
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+TRACE_FILE = os.environ.get("GFIRE_TRACE_FILE")
+TRACE_HEADER = "X-Trace-Id"
+
+# Stages in the order they happen for one speak command
+STAGES = [
+    "detect",       # client: button pressed (or input seen by the control loop)
+    "send",         # client: HTTP request about to go out
+    "receive",      # server: request handler entered
+    "enqueue",      # server: audio file resolved, handing off to playback
+    "spawn",        # server: player process started
+    "first_sample", # server: player opened the audio output
+    "done",         # server: playback finished
+    "ack",          # client: HTTP response received
+]
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Tracer:
+    """Appends {trace_id, stage, ts_ns, process} records to a trace file.
+
+    Marking is a no-op when no trace file is configured, so call sites
+    don't need to check whether tracing is enabled.
+    """
+
+    def __init__(self, process, path=TRACE_FILE):
+        self.process = process
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def mark(self, trace_id, stage, ts_ns=None, **attrs):
+        """Record `stage` now, or at `ts_ns` (epoch ns) for an earlier event"""
+        if not self.path or not trace_id:
+            return
+        record = {
+            "trace_id": trace_id,
+            "stage": stage,
+            "ts_ns": ts_ns if ts_ns is not None else time.time_ns(),
+            "process": self.process
+        }
+        record.update(attrs)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a', buffering=1)
+                self._file.write(line)
+            except OSError as e:
+                print(f"Trace write error: {e}")
+                self.path = None
+
+
+def load_traces(paths):
+    """trace_id -> {stage: (ts_ns, process)} merged from every trace file"""
+    traces = defaultdict(dict)
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                traces[record["trace_id"]][record["stage"]] = (record["ts_ns"], record["process"])
+    return traces
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def stage_breakdown(traces):
+    """Per-transition latency samples (ms) between consecutive recorded stages"""
+    samples = defaultdict(list)
+    cross_process = set()
+    for stages in traces.values():
+        present = [stage for stage in STAGES if stage in stages]
+        for prev, stage in zip(present, present[1:]):
+            key = f"{prev} -> {stage}"
+            samples[key].append((stages[stage][0] - stages[prev][0]) / 1e6)
+            if stages[stage][1] != stages[prev][1]:
+                cross_process.add(key)
+        if "detect" in stages and "first_sample" in stages:
+            total = (stages["first_sample"][0] - stages["detect"][0]) / 1e6
+            samples["detect -> first_sample (total)"].append(total)
+            cross_process.add("detect -> first_sample (total)")
+    return samples, cross_process
+
+
+def report(paths):
+    traces = load_traces(paths)
+    samples, cross_process = stage_breakdown(traces)
+    print(f"{len(traces)} traces from {len(paths)} file(s)")
+    print(f"{'stage':<36}{'n':>6}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)")
+
+    def order(key):
+        first = key.split(" -> ")[0]
+        return (key.endswith("(total)"), STAGES.index(first))
+
+    for key in sorted(samples, key=order):
+        values = sorted(samples[key])
+        marker = "*" if key in cross_process else " "
+        print(f"{key + marker:<36}{len(values):>6}"
+              f"{percentile(values, 0.5):>10.2f}{percentile(values, 0.9):>10.2f}"
+              f"{percentile(values, 0.99):>10.2f}{values[-1]:>10.2f}")
+    if cross_process:
+        print("* spans two processes; includes clock offset if they run on different hosts")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python latency_trace.py <trace.jsonl> [more.jsonl ...]")
+        sys.exit(1)
+    report(sys.argv[1:])
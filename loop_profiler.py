@@ -0,0 +1,221 @@
+"""
+Loop Profiler
+Per-tick timing for the device control loops: busy time per phase,
+deadline misses and sleep jitter, kept as fixed-bucket histograms
+
+Each tick costs a handful of perf_counter_ns() calls and dict updates.
+A one-line summary is printed every `summary_interval` seconds; send
+SIGUSR1 (where supported) for a full dump. With GFIRE_PROFILE_OVERRUN=1
+a tick that misses its deadline arms a stack sampler for the next few
+ticks and prints where they spent their time.
+"""
+
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Histogram bucket upper edges (ms); the last bucket catches everything above
+BUCKET_EDGES_MS = [0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+PROFILE_ON_OVERRUN = os.environ.get("GFIRE_PROFILE_OVERRUN") == "1"
+SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+PROFILE_TICKS = 5        # ticks sampled after an overrun
+PROFILE_COOLDOWN = 60.0  # seconds before another overrun may trigger sampling
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_EDGES_MS) + 1)
+        self.total = 0
+        self.max = 0.0
+
+    def add(self, value_ms):
+        self.counts[bisect_left(BUCKET_EDGES_MS, value_ms)] += 1
+        self.total += 1
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, fraction):
+        """Upper edge of the bucket holding the given fraction, capped at max (ms)"""
+        if not self.total:
+            return 0.0
+        target = fraction * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                edge = BUCKET_EDGES_MS[index] if index < len(BUCKET_EDGES_MS) else self.max
+                return min(edge, self.max)
+        return self.max
+
+    def to_dict(self):
+        labels = [f"<={edge}" for edge in BUCKET_EDGES_MS] + [f">{BUCKET_EDGES_MS[-1]}"]
+        return {
+            "count": self.total,
+            "max_ms": self.max,
+            "buckets_ms": {label: count for label, count in zip(labels, self.counts) if count}
+        }
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval until stopped"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL, depth=6):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.depth = depth
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[" <- ".join(stack)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class LoopProfiler:
+    """Instrumentation for a fixed-sleep control loop.
+
+    Call start_tick() at the top of each iteration and end_tick() just
+    before the loop's sleep; wrap work in `with profiler.phase("read"):`.
+    Phases marked idle (intentional pauses) don't count as busy time.
+    """
+
+    def __init__(self, name, period, deadline=None, summary_interval=60.0,
+                 profile_on_overrun=PROFILE_ON_OVERRUN):
+        self.name = name
+        self.period_ms = period * 1000
+        self.deadline_ms = (deadline if deadline is not None else period) * 1000
+        self.summary_interval = summary_interval
+        self.profile_on_overrun = profile_on_overrun
+
+        self.busy = Histogram()
+        self.jitter = Histogram()
+        self.phases = defaultdict(Histogram)
+        self.misses = 0
+        self.ticks = 0
+
+        self._tick_start = None
+        self._tick_phases = {}
+        self._idle_ns = 0
+        self._last_end = None
+        self._last_summary = time.monotonic()
+        self._sampler = None
+        self._sampled_ticks = 0
+        self._last_profile = 0.0
+
+        if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.dump())
+
+    def start_tick(self):
+        now = time.perf_counter_ns()
+        if self._last_end is not None:
+            # How much longer the loop slept than asked for
+            slept_ms = (now - self._last_end) / 1e6
+            self.jitter.add(max(0.0, slept_ms - self.period_ms))
+        self._tick_start = now
+        self._tick_phases = {}
+        self._idle_ns = 0
+
+    @contextmanager
+    def phase(self, name, idle=False):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self._tick_phases[name] = self._tick_phases.get(name, 0) + elapsed
+            if idle:
+                self._idle_ns += elapsed
+
+    def end_tick(self):
+        if self._tick_start is None:
+            return
+        now = time.perf_counter_ns()
+        busy_ms = (now - self._tick_start - self._idle_ns) / 1e6
+        self.busy.add(busy_ms)
+        for name, elapsed in self._tick_phases.items():
+            self.phases[name].add(elapsed / 1e6)
+        self.ticks += 1
+        self._last_end = now
+        self._tick_start = None
+
+        if busy_ms > self.deadline_ms:
+            self.misses += 1
+            self._on_overrun(busy_ms)
+        self._advance_sampler()
+
+        if time.monotonic() - self._last_summary >= self.summary_interval:
+            print(f"\n{self.summary()}")
+            self._last_summary = time.monotonic()
+
+    def _on_overrun(self, busy_ms):
+        if not self.profile_on_overrun or self._sampler is not None:
+            return
+        if time.monotonic() - self._last_profile < PROFILE_COOLDOWN:
+            return
+        print(f"\n[{self.name}] tick overran: {busy_ms:.1f} ms > {self.deadline_ms:.0f} ms, "
+              f"sampling the next {PROFILE_TICKS} ticks")
+        self._sampler = StackSampler(threading.get_ident())
+        self._sampler.start()
+        self._sampled_ticks = 0
+
+    def _advance_sampler(self):
+        if self._sampler is None:
+            return
+        self._sampled_ticks += 1
+        if self._sampled_ticks < PROFILE_TICKS:
+            return
+        self._sampler.stop()
+        print(f"[{self.name}] hottest stacks over {PROFILE_TICKS} ticks:")
+        for stack, count in self._sampler.samples.most_common(10):
+            print(f"  {count:>5}  {stack}")
+        self._sampler = None
+        self._last_profile = time.monotonic()
+
+    def summary(self):
+        phases = " ".join(
+            f"{name}={hist.percentile(0.5):g}/{hist.max:.1f}"
+            for name, hist in sorted(self.phases.items())
+        )
+        return (f"[{self.name}] ticks={self.ticks} "
+                f"busy p50<={self.busy.percentile(0.5):g} p99<={self.busy.percentile(0.99):g} "
+                f"max={self.busy.max:.1f} ms | misses={self.misses} | "
+                f"jitter p99<={self.jitter.percentile(0.99):g} ms | phases p50/max ms: {phases}")
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "period_ms": self.period_ms,
+            "deadline_ms": self.deadline_ms,
+            "ticks": self.ticks,
+            "misses": self.misses,
+            "busy": self.busy.to_dict(),
+            "jitter": self.jitter.to_dict(),
+            "phases": {name: hist.to_dict() for name, hist in self.phases.items()}
+        }
+
+    def dump(self, path=None):
+        """Print the full histograms, or write them as JSON to `path`"""
+        if path:
+            with open(path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        else:
+            print("\n" + json.dumps(self.to_dict(), indent=2))
@@ -0,0 +1,362 @@
+"""
+MODI+ Topology Cache
+Warm starts for MODI+ devices from the modules seen on the last run
+
+A cold start lets modi_plus reboot every module, waits for the network
+module's USB handshake (which reboots them once more) and then for the
+modules to announce themselves, which takes seconds. The topology found
+(serial port, module types, ids and uuids) is cached in TOPOLOGY_FILE.
+The next start opens the cached port, creates those modules directly and
+asks every module to identify itself once. It is ready as soon as the
+cached modules answer with their cached uuids. Anything else (another
+network, a swapped module, no answer within MATCH_WINDOW) falls back to
+a full cold discovery, which rewrites the cache.
+
+A warm start skips the library's reboot and interpreter erase; set
+GFIRE_MODI_WARM=0 (or `forget`) after reprogramming the network module.
+
+    python modi_topology.py show                         # cached topology and start times
+    python modi_topology.py probe --require imu,button   # time to first reading
+    python modi_topology.py forget                       # next start is cold
+"""
+
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+
+import modi_plus
+from modi_plus.module.module import BROADCAST_ID, get_module_from_name
+from modi_plus.task.exe_task import ExeTask
+from modi_plus.task.serialport_task import SerialportTask
+from modi_plus.util.connection_util import list_modi_ports
+from modi_plus.util.message_util import unpack_data
+from modi_plus.util.modi_serialport import ModiSerialPort
+from serial.serialutil import SerialException
+
+TOPOLOGY_FILE = os.environ.get("GFIRE_MODI_TOPOLOGY", "modi_topology.json")
+WARM_START = os.environ.get("GFIRE_MODI_WARM", "1") != "0"
+READY_TIMEOUT = 5.0   # cold start: seconds for the required modules to appear
+OPTIONAL_GRACE = 0.5  # cold start: extra seconds for optional modules
+MATCH_WINDOW = 1.0    # warm start: seconds for the cached modules to answer
+
+# Cheap property per module type, used to time the first reading
+FIRST_READING = {
+    "imu": lambda module: module.acceleration_x,
+    "button": lambda module: module.pressed,
+    "env": lambda module: module.temperature,
+    "dial": lambda module: module.turn,
+    "tof": lambda module: module.distance,
+}
+
+
+class MissingModulesError(Exception):
+    """A module an app needs is not connected"""
+
+    def __init__(self, missing, connected):
+        self.missing = missing
+        found = ", ".join(f"{module.module_type} 0x{module.id:X}" for module in connected)
+        super().__init__(f"MODI+ module(s) not found: {', '.join(missing)} "
+                         f"(connected: {found or 'none'})")
+
+
+class _CachedPortTask(SerialportTask):
+    """SerialportTask that opens the cached port. The library's own
+    explicit-port path calls ModiSerialPort.open() without the port"""
+
+    def __init__(self, port):
+        super().__init__(False, port)
+        self.port = port
+
+    def open_connection(self):
+        if self.port not in list_modi_ports():
+            raise SerialException(f"{self.port} is not connected to a MODI+ network module")
+        bus = ModiSerialPort(timeout=0.01)
+        bus.open(self.port)
+        self._bus = bus
+        self._SerialportTask__open_recv_thread()
+
+
+class _WarmExeTask(ExeTask):
+    """ExeTask that neither reboots the modules nor erases the network's
+    interpreter, and records the uuid each module reports"""
+
+    def __init__(self, modules, connection_task):
+        # No super().__init__(): it broadcasts a reboot
+        self._modules = modules
+        self._connection = connection_task
+        self.reported = {}  # module id -> uuid from its assign-id message
+
+    def identify(self):
+        """Ask every module for its id and uuid, and to stay out of PnP mode"""
+        self._ExeTask__request_find_id(BROADCAST_ID)
+        self._ExeTask__request_find_network_id(BROADCAST_ID)
+        self._ExeTask__request_pnp_off(BROADCAST_ID)
+
+    def _ExeTask__update_assign_id(self, message):
+        module_uuid, _, _ = unpack_data(message["b"], (6, 2, 2))
+        self.reported[message["s"]] = module_uuid
+        super()._ExeTask__update_assign_id(message)
+
+
+class _WarmExeThread(threading.Thread):
+    def __init__(self, task):
+        super().__init__(daemon=True)
+        self.task = task
+        self._closed = False
+
+    def run(self):
+        while not self._closed:
+            self.task.run(delay=0.001)
+
+    def close(self):
+        self._closed = True
+
+
+class _WarmMODIPlus(modi_plus.MODIPlus):
+    """MODIPlus built from a cached topology; returns without waiting"""
+
+    def __init__(self, topology):
+        self._modules = []
+        self._connection = _CachedPortTask(topology["port"])
+        now = time.time()
+        for order, entry in enumerate(topology["modules"]):
+            module = get_module_from_name(entry["type"])(entry["id"], entry["uuid"], self._connection)
+            module.module_type = entry["type"]
+            module.app_version = _pack_version(entry["app_version"])
+            module.os_version = _pack_version(entry["os_version"])
+            module.first_connected_time = now + order * 1e-6  # keep the cached order
+            if entry["type"] == "network":
+                module.is_usb_connected = True  # skips the erase-and-reboot handshake
+            self._modules.append(module)
+
+        self._connection.open_connection()
+        self.task = _WarmExeTask(self._modules, self._connection)
+        self._exe_thread = _WarmExeThread(self.task)
+        self._exe_thread.start()
+        self.task.identify()
+        atexit.register(self.close)
+
+
+class Hardware:
+    """Connected bundle plus the module of each type an app asked for"""
+
+    def __init__(self, bundle, modules, mode, started):
+        self.bundle = bundle
+        self.modules = modules  # type -> module, None for a missing optional one
+        self.mode = mode        # "warm" or "cold"
+        self.started = started
+        self.ready_ms = (time.monotonic() - started) * 1000
+        self.first_reading_ms = None
+
+    def __getitem__(self, module_type):
+        return self.modules[module_type]
+
+    def first_reading(self, read=None):
+        """Time to first reading: call `read` (or just mark the moment) once
+        the first sensor value is in; reports and records it the first time"""
+        value = read() if read else None
+        if self.first_reading_ms is None:
+            self.first_reading_ms = (time.monotonic() - self.started) * 1000
+            print(f"MODI+ first reading {self.first_reading_ms:.0f} ms after connect "
+                  f"({self.mode} start)")
+            record_start(self.mode, self.ready_ms, self.first_reading_ms)
+        return value
+
+
+def _pack_version(text):
+    major, minor, patch = (int(part) for part in text.split("."))
+    return major << 13 | minor << 8 | patch
+
+
+def load_topology():
+    try:
+        with open(TOPOLOGY_FILE, "r") as f:
+            topology = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Warning: Could not read MODI+ topology. {e}")
+        return None
+    if not topology.get("port") or not topology.get("modules"):
+        return None
+    return topology
+
+
+def _write_topology(topology):
+    temporary = f"{TOPOLOGY_FILE}.tmp"
+    try:
+        with open(temporary, "w") as f:
+            json.dump(topology, f, indent=2)
+        os.replace(temporary, TOPOLOGY_FILE)
+    except IOError as e:
+        print(f"Warning: Could not save MODI+ topology. {e}")
+
+
+def save_topology(bundle):
+    previous = load_topology() or {}
+    modules = [
+        {"type": module.module_type, "id": module.id, "uuid": module.uuid,
+         "app_version": module.app_version, "os_version": module.os_version}
+        for module in bundle.modules if module.is_connected
+    ]
+    _write_topology({
+        "port": getattr(bundle._connection.bus, "_port", None),
+        "modules": modules,
+        "saved_at": time.time(),
+        "starts": previous.get("starts", {})
+    })
+
+
+def record_start(mode, ready_ms, first_reading_ms):
+    """Keeps the latest start times per mode next to the topology"""
+    topology = load_topology()
+    if topology is None:
+        return
+    topology.setdefault("starts", {})[mode] = {
+        "ready_ms": round(ready_ms, 1),
+        "first_reading_ms": round(first_reading_ms, 1),
+        "at": time.time()
+    }
+    _write_topology(topology)
+
+
+def forget_topology():
+    try:
+        os.remove(TOPOLOGY_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def _of_type(bundle, module_type):
+    """Modules of one type, in connection order like bundle.imus etc."""
+    return [module for module in bundle.modules if module.module_type == module_type]
+
+
+def _warm_connect(topology, required, optional):
+    """_WarmMODIPlus once the cached modules check out, else None"""
+    cached_types = {entry["type"] for entry in topology["modules"]}
+    if not set(required) <= cached_types:
+        return None
+
+    bundle = _WarmMODIPlus(topology)
+    expected = {module.id: module.uuid for module in bundle.modules}
+    needed = {module.id for module in bundle.modules
+              if module.module_type in required or module.module_type == "network"}
+    deadline = time.monotonic() + MATCH_WINDOW
+    while True:
+        reported = dict(bundle.task.reported)
+        if any(reported.get(module_id, uuid) != uuid for module_id, uuid in expected.items()):
+            reason = "a cached module id now has another uuid"
+            break
+        if expected.keys() <= reported.keys():
+            return bundle
+        if time.monotonic() >= deadline:
+            missing = needed - reported.keys()
+            if not missing:
+                # Only optional modules are gone; drop them rather than rediscover
+                for module in list(bundle._modules):
+                    if module.id not in reported:
+                        bundle._modules.remove(module)
+                save_topology(bundle)
+                return bundle
+            reason = "no reply from " + ", ".join(f"0x{module_id:X}" for module_id in sorted(missing))
+            break
+        time.sleep(0.005)
+
+    print(f"MODI+ topology changed ({reason}), rediscovering...")
+    bundle.close()
+    return None
+
+
+def _cold_connect(required, optional, timeout):
+    bundle = modi_plus.MODIPlus()
+    deadline = time.monotonic() + timeout
+    while (any(not _of_type(bundle, t) for t in required)
+           and time.monotonic() < deadline):
+        time.sleep(0.05)
+    deadline = min(deadline, time.monotonic() + OPTIONAL_GRACE)
+    while (any(not _of_type(bundle, t) for t in optional)
+           and time.monotonic() < deadline):
+        time.sleep(0.05)
+    return bundle
+
+
+def connect_modules(required, optional=(), warm=WARM_START, timeout=READY_TIMEOUT):
+    """
+    Connects to the MODI+ network and checks the modules an app needs.
+
+    `required` and `optional` are module types ("imu", "button", ...).
+    Returns a Hardware; raises MissingModulesError if a required module
+    is not connected.
+    """
+    started = time.monotonic()
+    bundle = None
+    mode = "warm"
+    topology = load_topology() if warm else None
+    if topology:
+        try:
+            bundle = _warm_connect(topology, required, optional)
+        except Exception as e:
+            print(f"MODI+ warm start failed, rediscovering: {e}")
+    if bundle is None:
+        mode = "cold"
+        bundle = _cold_connect(required, optional, timeout)
+
+    modules = {}
+    for module_type in (*required, *optional):
+        found = _of_type(bundle, module_type)
+        modules[module_type] = found[0] if found else None
+    missing = [t for t in required if modules[t] is None]
+    if missing:
+        connected = list(bundle.modules)
+        bundle.close()
+        raise MissingModulesError(missing, connected)
+
+    if mode == "cold":
+        save_topology(bundle)
+    hardware = Hardware(bundle, modules, mode, started)
+    print(f"MODI+ ready in {hardware.ready_ms:.0f} ms ({mode} start)")
+    return hardware
+
+
+def show():
+    topology = load_topology()
+    if topology is None:
+        print(f"No cached topology in {TOPOLOGY_FILE}; the next start is cold")
+        return
+    print(f"Port {topology['port']}, saved {time.ctime(topology['saved_at'])}")
+    for entry in topology["modules"]:
+        print(f"  {entry['type']:<8} 0x{entry['id']:03X}  uuid 0x{entry['uuid']:X}  "
+              f"app {entry['app_version']} os {entry['os_version']}")
+    for mode, start in sorted(topology.get("starts", {}).items()):
+        print(f"Last {mode} start: ready {start['ready_ms']:.0f} ms, "
+              f"first reading {start['first_reading_ms']:.0f} ms")
+
+
+def probe(required, warm):
+    hardware = connect_modules(required, warm=warm)
+    readable = [t for t in required if t in FIRST_READING]
+    if readable:
+        module = hardware[readable[0]]
+        hardware.first_reading(lambda: FIRST_READING[readable[0]](module))
+    hardware.bundle.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MODI+ topology cache")
+    parser.add_argument("command", choices=["show", "probe", "forget"])
+    parser.add_argument("--require", default="imu,button,speaker",
+                        help="comma-separated module types for probe")
+    parser.add_argument("--cold", action="store_true", help="probe without the cache")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        show()
+    elif args.command == "forget":
+        forget_topology()
+        print(f"Removed {TOPOLOGY_FILE}")
+    else:
+        probe([t.strip() for t in args.require.split(",") if t.strip()], not args.cold)
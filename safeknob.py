@@ -1,7 +1,10 @@
-import modi_plus
 import time
 import threading
 
+from alert_bus import AlertBus, TOPIC_SAFEKNOB_LEVEL
+from loop_profiler import LoopProfiler
+from modi_topology import connect_modules, MissingModulesError
+
 # --- SafeKnob 설정 (기본값) ---
 CRITICAL_TEMP = 60  # 적색 경고 임계 온도 (°C)
 WARNING_TEMP = 55   # 황색 경고 임계 온도 (°C)
@@ -58,31 +61,20 @@ def run_safeknob():
     
     try:
         print("MODI+ 모듈을 초기화합니다 (SafeKnob)...")
-        bundle = modi_plus.MODIPlus()
-        
-        # 모듈 연결 상태 확인
-        print(f"연결된 모듈 수: Env={len(bundle.envs)}, LED={len(bundle.leds)}, Speaker={len(bundle.speakers)}")
-        
-        if len(bundle.envs) == 0:
-            print("❌ Env 모듈이 연결되지 않았습니다!")
-            return
-        if len(bundle.leds) == 0:
-            print("❌ LED 모듈이 연결되지 않았습니다!")
-            return
-        if len(bundle.speakers) == 0:
-            print("❌ Speaker 모듈이 연결되지 않았습니다!")
+        # 모듈 연결 상태 확인 (지난 실행의 구성이 캐시되어 있으면 빠르게 시작)
+        try:
+            hardware = connect_modules(("env", "led", "speaker"))
+        except MissingModulesError as e:
+            print(f"❌ {e}")
             return
             
-        env = bundle.envs[0]
-        led = bundle.leds[0]
-        speaker = bundle.speakers[0]
+        env, led, speaker = hardware["env"], hardware["led"], hardware["speaker"]
+        hardware.first_reading(lambda: env.temperature)
         print("✅ 초기화 완료. SafeKnob 작동을 시작합니다.")
         
         # 사용자 입력 스레드 시작
         input_thread = threading.Thread(target=user_input_handler, daemon=True)
         input_thread.start()
-        
-        time.sleep(1)
 
     except Exception as e:
         print(f"초기화 중 오류 발생: {e}")
@@ -91,32 +83,47 @@ def run_safeknob():
 
     # 상태 변수
     is_beeping = False
+    alert_bus = AlertBus("safeknob")
+    profiler = LoopProfiler("safeknob", period=0.5)
+    phase = profiler.phase
 
     while True:
+        profiler.start_tick()
         try:
             # 시뮬레이션 온도가 설정되어 있으면 사용, 아니면 실제 센서 값 사용
-            if simulated_temp is not None:
-                temp = simulated_temp
-                temp_source = "시뮬레이션"
-            else:
-                temp = env.temperature
-                temp_source = "센서"
+            with phase("read"):
+                if simulated_temp is not None:
+                    temp = simulated_temp
+                    temp_source = "시뮬레이션"
+                else:
+                    temp = env.temperature
+                    temp_source = "센서"
             
             print(f"현재 온도: {temp:.1f}°C ({temp_source}) | 위험: {WARNING_TEMP}°C    ", end='\r')
 
             # 1. 고온 위험 (적색 경고 + 삐 소리)
             if temp > WARNING_TEMP:
-                led.set_rgb(255, 0, 0)  # 빨간색
+                with phase("actuate"):
+                    led.set_rgb(255, 0, 0)  # 빨간색
+                    if not is_beeping:
+                        speaker.set_tune(frequency=2000, volume=100)
                 if not is_beeping:
-                    speaker.set_tune(frequency=2000, volume=100)
                     is_beeping = True
+                    with phase("network"):
+                        alert_bus.publish(TOPIC_SAFEKNOB_LEVEL, "danger",
+                                          "High temperature", temperature=temp)
             
             # 2. 안전 (녹색)
             else:
-                led.set_rgb(0, 255, 0)  # 초록색
+                with phase("actuate"):
+                    led.set_rgb(0, 255, 0)  # 초록색
+                    if is_beeping:
+                        speaker.turn_off()
                 if is_beeping:
-                    speaker.turn_off()
                     is_beeping = False
+                    with phase("network"):
+                        alert_bus.publish(TOPIC_SAFEKNOB_LEVEL, "safe",
+                                          "Temperature normal", temperature=temp)
 
         except Exception as e:
             print(f"\n작동 중 오류 발생: {e}")
@@ -127,6 +134,7 @@ def run_safeknob():
                 pass
             time.sleep(1)
 
+        profiler.end_tick()
         time.sleep(0.5)  # 0.5초 간격으로 센서 값 확인
 
 if __name__ == "__main__":
@@ -4,11 +4,14 @@ Smart fire door safety system using MODI+ sensors
 """
 
 import time
-import modi_plus
 import json
 import os
 from enum import Enum
 
+from alert_bus import AlertBus, TOPIC_SAFEKNOB_LEVEL
+from loop_profiler import LoopProfiler
+from modi_topology import connect_modules
+
 
 class SafetyLevel(Enum):
     SAFE = "safe"
@@ -28,7 +31,7 @@ class SafeKnobApp:
         self.SMOKE_LIGHT_DROP = 30
         
         # Initialize MODI+ modules
-        self.bundle = None
+        self.hardware = None
         self.env_sensor = None
         self.led = None
         self.speaker = None
@@ -41,23 +44,29 @@ class SafeKnobApp:
         
         # Log file
         self.log_file = "safeknob_log.json"
+
+        # Alert bus (no-op when the broker is not running)
+        self.alert_bus = AlertBus("safeknob_app")
+
+        # Remote dashboard upload (SAFEKNOB_INGEST_URL); None when not configured.
+        # Imported only then, as it brings in requests
+        self.ingest = None
+        if os.environ.get("SAFEKNOB_INGEST_URL"):
+            from safeknob_ingest import IngestUploader
+            self.ingest = IngestUploader.from_env()
         
     def initialize_hardware(self):
         """Initialize MODI+ modules"""
         try:
             print("Initializing SafeKnob hardware...")
-            self.bundle = modi_plus.MODIPlus()
+            # Raises MissingModulesError naming any missing module
+            self.hardware = connect_modules(("env", "led"), optional=("speaker", "network"))
             
             # Get modules
-            self.env_sensor = self.bundle.envs[0] if self.bundle.envs else None
-            self.led = self.bundle.leds[0] if self.bundle.leds else None
-            self.speaker = self.bundle.speakers[0] if self.bundle.speakers else None
-            self.network = self.bundle.networks[0] if self.bundle.networks else None
-            
-            if not self.env_sensor:
-                raise Exception("Environment sensor not found")
-            if not self.led:
-                raise Exception("LED module not found")
+            self.env_sensor = self.hardware["env"]
+            self.led = self.hardware["led"]
+            self.speaker = self.hardware["speaker"]
+            self.network = self.hardware["network"]
                 
             print("✓ Hardware initialization complete")
             return True
@@ -210,36 +219,64 @@ class SafeKnobApp:
         print(f"안전: <{self.SAFE_TEMP}°C | 주의: {self.WARNING_TEMP}-{self.DANGER_TEMP}°C | 위험: >{self.DANGER_TEMP}°C")
         print("Ctrl+C로 종료\n")
         
+        profiler = LoopProfiler("safeknob_app", period=0.5)
+        phase = profiler.phase
+        if self.ingest:
+            self.ingest.start()
+            print(f"원격 대시보드 전송: {self.ingest.url} (door={self.ingest.door})")
+        
         try:
             while True:
+                profiler.start_tick()
+                
                 # Read sensors
-                temperature, light_level = self.read_sensors()
+                with phase("read"):
+                    temperature, light_level = self.read_sensors()
                 
                 if temperature is not None and light_level is not None:
+                    self.hardware.first_reading()
+                    
                     # Assess safety
-                    new_safety_level = self.assess_safety_level(temperature, light_level)
+                    with phase("assess"):
+                        new_safety_level = self.assess_safety_level(temperature, light_level)
                     
-                    # Update indicators
-                    self.update_led_indicator(new_safety_level)
+                    with phase("actuate"):
+                        # Update indicators
+                        self.update_led_indicator(new_safety_level)
+                        
+                        # Play alerts if safety level changed or is dangerous
+                        if (new_safety_level != self.current_safety_level or 
+                            new_safety_level == SafetyLevel.DANGER):
+                            self.play_alert_sound(new_safety_level)
                     
-                    # Play alerts if safety level changed or is dangerous
-                    if (new_safety_level != self.current_safety_level or 
-                        new_safety_level == SafetyLevel.DANGER):
-                        self.play_alert_sound(new_safety_level)
+                    # Every reading goes to the remote dashboard, batched
+                    if self.ingest:
+                        self.ingest.add(temperature, light_level, new_safety_level.value)
                     
                     # Log data
                     if new_safety_level != self.current_safety_level:
-                        self.log_reading(temperature, light_level, new_safety_level)
+                        with phase("network"):
+                            self.alert_bus.publish(
+                                TOPIC_SAFEKNOB_LEVEL, new_safety_level.value,
+                                f"Safety level changed to {new_safety_level.value}",
+                                temperature=temperature, light_level=light_level
+                            )
+                        with phase("log"):
+                            self.log_reading(temperature, light_level, new_safety_level)
                         if new_safety_level != SafetyLevel.SAFE:
                             print(f"\n⚠️  안전 상태 변경: {new_safety_level.value.upper()}")
                     
                     self.current_safety_level = new_safety_level
                     self.print_status(temperature, light_level, new_safety_level)
                 
+                profiler.end_tick()
                 time.sleep(0.5)
                 
         except KeyboardInterrupt:
             print("\n\n🛑 SafeKnob 중지됨")
+            print(profiler.summary())
+            if self.ingest:
+                self.ingest.close()
             if self.led:
                 self.led.rgb = 0, 0, 0  # Turn off LED
             if self.speaker:
@@ -0,0 +1,167 @@
+"""
+SafeKnob Ingest Uploader
+Batches readings from door monitors on other hosts and ships them to the
+dashboard's /api/ingest endpoint
+
+A monitor sets SAFEKNOB_INGEST_URL (dashboard base URL) and
+SAFEKNOB_INGEST_TOKEN; SafeKnobApp then uploads every reading. A gateway
+can push many doors through one uploader by passing `door=` to add().
+
+    python safeknob_ingest.py bench --doors 500 --rate 4   # simulated building
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+
+import requests
+
+INGEST_URL = os.environ.get("SAFEKNOB_INGEST_URL")
+INGEST_TOKEN = os.environ.get("SAFEKNOB_INGEST_TOKEN", "")
+DOOR_ID = os.environ.get("SAFEKNOB_DOOR_ID") or socket.gethostname()
+FLUSH_INTERVAL = float(os.environ.get("SAFEKNOB_INGEST_FLUSH", "2.0"))  # seconds
+MAX_BATCH = int(os.environ.get("SAFEKNOB_INGEST_BATCH", "500"))         # readings per request
+MAX_BUFFER = 50000        # readings held while the dashboard is unreachable
+UPLOAD_TIMEOUT = 5
+COLUMNS = ["door", "timestamp", "temperature", "light_level", "safety_level"]
+
+
+class IngestUploader(threading.Thread):
+    """Collects readings column-wise and posts them in batches.
+
+    Flushes every `flush_interval` seconds, or as soon as `max_batch`
+    readings are waiting. Failed batches stay buffered (oldest dropped
+    beyond MAX_BUFFER) and go out with the next flush.
+    """
+
+    def __init__(self, url, token, door=DOOR_ID, flush_interval=FLUSH_INTERVAL,
+                 max_batch=MAX_BATCH):
+        super().__init__(daemon=True)
+        self.url = f"{url.rstrip('/')}/api/ingest"
+        self.door = door
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.sent = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._columns = {name: [] for name in COLUMNS}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    @classmethod
+    def from_env(cls):
+        """Uploader configured from the environment, or None if ingest is off"""
+        if not INGEST_URL:
+            return None
+        return cls(INGEST_URL, INGEST_TOKEN)
+
+    def add(self, temperature, light_level, safety_level, timestamp=None, door=None):
+        with self._lock:
+            columns = self._columns
+            columns["door"].append(door or self.door)
+            columns["timestamp"].append(timestamp or time.time())
+            columns["temperature"].append(temperature)
+            columns["light_level"].append(light_level)
+            columns["safety_level"].append(safety_level)
+            pending = len(columns["timestamp"])
+            if pending > MAX_BUFFER:
+                for values in columns.values():
+                    del values[:pending - MAX_BUFFER]
+                self.dropped += pending - MAX_BUFFER
+        if pending >= self.max_batch:
+            self._wake.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """Send everything buffered, max_batch readings per request"""
+        while True:
+            # Taken out of the buffer while in flight, so add() trimming
+            # the oldest readings can't remove unsent ones after the post
+            with self._lock:
+                count = min(len(self._columns["timestamp"]), self.max_batch)
+                if not count:
+                    return
+                batch = {}
+                for name, values in self._columns.items():
+                    batch[name] = values[:count]
+                    del values[:count]
+
+            try:
+                response = self.session.post(self.url, json=batch, timeout=UPLOAD_TIMEOUT)
+                response.raise_for_status()
+                result = response.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                self._requeue(batch)
+                print(f"Ingest upload failed, {count} readings kept: {e}")
+                return
+
+            self.sent += result.get("accepted", 0)
+            self.rejected += result.get("rejected", 0)
+
+    def _requeue(self, batch):
+        """Put a failed batch back in front of newer readings"""
+        with self._lock:
+            for name, values in self._columns.items():
+                values[:0] = batch[name]
+            pending = len(self._columns["timestamp"])
+            if pending > MAX_BUFFER:
+                for values in self._columns.values():
+                    del values[:pending - MAX_BUFFER]
+                self.dropped += pending - MAX_BUFFER
+
+    def close(self):
+        self._stop_event.set()
+        self._wake.set()
+        self.join(timeout=UPLOAD_TIMEOUT + 1)
+        self.session.close()
+
+
+def bench(url, token, doors, rate, duration, flush_interval, max_batch):
+    """Simulate `doors` monitors each reporting `rate` times per second"""
+    uploader = IngestUploader(url, token, flush_interval=flush_interval, max_batch=max_batch)
+    uploader.start()
+    door_ids = [f"door-{i:04d}" for i in range(doors)]
+    interval = 1.0 / rate
+    start = time.monotonic()
+    tick = 0
+    while time.monotonic() - start < duration:
+        now = time.time()
+        for i, door in enumerate(door_ids):
+            temperature = 22 + (i + tick) % 40
+            level = "danger" if temperature >= 55 else "warning" if temperature >= 45 else "safe"
+            uploader.add(temperature, 50, level, timestamp=now, door=door)
+        tick += 1
+        time.sleep(max(0.0, start + tick * interval - time.monotonic()))
+    upload_start = time.monotonic()
+    uploader.close()
+    elapsed = time.monotonic() - start
+    print(f"Generated {doors * tick} readings in {duration:.0f} s "
+          f"({doors * rate:.0f}/s target), flushed in {time.monotonic() - upload_start:.2f} s")
+    print(f"Accepted {uploader.sent} ({uploader.sent / elapsed:.0f}/s), "
+          f"rejected {uploader.rejected}, dropped {uploader.dropped}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SafeKnob ingest uploader")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--url", default=INGEST_URL or "http://localhost:8001")
+    parser.add_argument("--token", default=INGEST_TOKEN)
+    parser.add_argument("--doors", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=2.0, help="readings per door per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--batch", type=int, default=MAX_BATCH)
+    args = parser.parse_args()
+    bench(args.url, args.token, args.doors, args.rate, args.duration,
+          args.flush_interval, args.batch)
@@ -3,340 +3,928 @@ SafeKnob Web Interface
 Web dashboard for monitoring door safety status
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+import asyncio
+import base64
+import gzip
+import hashlib
+import hmac
+import itertools
 import json
 import os
+import signal
+import threading
 import time
+from bisect import bisect_left, bisect_right
+from collections import deque
 from datetime import datetime
+from operator import itemgetter
+
+import numpy as np
+
+from alert_bus import AlertBus, TOPIC_SAFEKNOB_ALERT
+from shared_state import SharedStateReader, SharedStateWriter
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = FastAPI(title="SafeKnob Dashboard", description="Door Safety Monitoring System")
 
 LOG_FILE = "safeknob_log.json"
+WEB_PORT = int(os.environ.get("SAFEKNOB_WEB_PORT", "8001"))
+# Set by the multi-worker launcher: workers read state from this segment
+SHARED_STATE_NAME = os.environ.get("SAFEKNOB_SHARED_STATE")
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 
-@app.get("/", response_class=HTMLResponse)
-async def dashboard():
-    """Main dashboard page"""
-    html_content = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>SafeKnob Dashboard</title>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1">
-        <style>
-            body {
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                margin: 0;
-                padding: 20px;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-            }
-            .container {
-                max-width: 1200px;
-                margin: 0 auto;
-                background: white;
-                border-radius: 15px;
-                box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-                overflow: hidden;
-            }
-            .header {
-                background: linear-gradient(135deg, #ff6b6b, #ee5a24);
-                color: white;
-                padding: 30px;
-                text-align: center;
-            }
-            .header h1 {
-                margin: 0;
-                font-size: 2.5em;
-                font-weight: 300;
-            }
-            .header p {
-                margin: 10px 0 0 0;
-                opacity: 0.9;
-                font-size: 1.1em;
-            }
-            .status-grid {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-                gap: 20px;
-                padding: 30px;
-            }
-            .status-card {
-                background: #f8f9fa;
-                border-radius: 10px;
-                padding: 25px;
-                box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-                transition: transform 0.3s ease;
-            }
-            .status-card:hover {
-                transform: translateY(-5px);
-            }
-            .status-indicator {
-                display: flex;
-                align-items: center;
-                margin-bottom: 15px;
-            }
-            .status-dot {
-                width: 20px;
-                height: 20px;
-                border-radius: 50%;
-                margin-right: 15px;
-                animation: pulse 2s infinite;
-            }
-            .safe { background-color: #2ecc71; }
-            .warning { background-color: #f39c12; }
-            .danger { background-color: #e74c3c; }
-            @keyframes pulse {
-                0% { opacity: 1; transform: scale(1); }
-                50% { opacity: 0.7; transform: scale(1.1); }
-                100% { opacity: 1; transform: scale(1); }
-            }
-            .metric {
-                display: flex;
-                justify-content: space-between;
-                margin: 10px 0;
-                padding: 10px;
-                background: white;
-                border-radius: 5px;
-                border-left: 4px solid #3498db;
-            }
-            .metric-label {
-                font-weight: 600;
-                color: #34495e;
-            }
-            .metric-value {
-                font-weight: bold;
-                color: #2c3e50;
-            }
-            .log-section {
-                padding: 30px;
-                background: #f8f9fa;
-                border-top: 1px solid #dee2e6;
-            }
-            .log-entry {
-                background: white;
-                margin: 10px 0;
-                padding: 15px;
-                border-radius: 8px;
-                border-left: 4px solid #3498db;
-                box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-            }
-            .log-entry.warning { border-left-color: #f39c12; }
-            .log-entry.danger { border-left-color: #e74c3c; }
-            .refresh-btn {
-                background: #3498db;
-                color: white;
-                border: none;
-                padding: 12px 24px;
-                border-radius: 6px;
-                cursor: pointer;
-                font-size: 16px;
-                margin: 20px 0;
-                transition: background 0.3s ease;
-            }
-            .refresh-btn:hover {
-                background: #2980b9;
-            }
-            .timestamp {
-                color: #7f8c8d;
-                font-size: 0.9em;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🔥 SafeKnob Dashboard</h1>
-                <p>실시간 문 손잡이 안전 모니터링 시스템</p>
-            </div>
-            
-            <div id="status-content">
-                <div class="status-grid">
-                    <div class="status-card">
-                        <div class="status-indicator">
-                            <div class="status-dot safe" id="status-dot"></div>
-                            <h3 id="status-text">시스템 로딩 중...</h3>
-                        </div>
-                        <div class="metric">
-                            <span class="metric-label">온도</span>
-                            <span class="metric-value" id="temperature">--°C</span>
-                        </div>
-                        <div class="metric">
-                            <span class="metric-label">조도</span>
-                            <span class="metric-value" id="light-level">--</span>
-                        </div>
-                        <div class="metric">
-                            <span class="metric-label">마지막 업데이트</span>
-                            <span class="metric-value" id="last-update">--</span>
-                        </div>
-                    </div>
-                    
-                    <div class="status-card">
-                        <h3>🛡️ 안전 기준</h3>
-                        <div class="metric">
-                            <span class="metric-label">안전</span>
-                            <span class="metric-value" style="color: #2ecc71;">&lt; 30°C</span>
-                        </div>
-                        <div class="metric">
-                            <span class="metric-label">주의</span>
-                            <span class="metric-value" style="color: #f39c12;">45-55°C</span>
-                        </div>
-                        <div class="metric">
-                            <span class="metric-label">위험</span>
-                            <span class="metric-value" style="color: #e74c3c;">&gt; 55°C</span>
-                        </div>
-                    </div>
-                </div>
-                
-                <button class="refresh-btn" onclick="refreshData()">📊 데이터 새로고침</button>
-            </div>
-            
-            <div class="log-section">
-                <h3>📋 최근 로그</h3>
-                <div id="log-entries">
-                    로그 데이터 로딩 중...
-                </div>
-            </div>
-        </div>
-
-        <script>
-            async function fetchStatus() {
-                try {
-                    const response = await fetch('/api/status');
-                    const data = await response.json();
-                    
-                    // Update status indicator
-                    const statusDot = document.getElementById('status-dot');
-                    const statusText = document.getElementById('status-text');
-                    
-                    statusDot.className = 'status-dot ' + data.safety_level;
-                    
-                    const statusMap = {
-                        'safe': '🟢 안전',
-                        'warning': '🟡 주의',
-                        'danger': '🔴 위험'
-                    };
-                    statusText.textContent = statusMap[data.safety_level] || '알 수 없음';
-                    
-                    // Update metrics
-                    document.getElementById('temperature').textContent = data.temperature + '°C';
-                    document.getElementById('light-level').textContent = data.light_level;
-                    document.getElementById('last-update').textContent = data.last_update;
-                    
-                } catch (error) {
-                    console.error('상태 업데이트 실패:', error);
-                    document.getElementById('status-text').textContent = '연결 오류';
-                }
-            }
-            
-            async function fetchLogs() {
-                try {
-                    const response = await fetch('/api/logs');
-                    const logs = await response.json();
-                    
-                    const logContainer = document.getElementById('log-entries');
-                    
-                    if (logs.length === 0) {
-                        logContainer.innerHTML = '<p>로그 데이터가 없습니다.</p>';
-                        return;
-                    }
-                    
-                    logContainer.innerHTML = logs.slice(-10).reverse().map(log => `
-                        <div class="log-entry ${log.safety_level}">
-                            <strong>${log.readable_time}</strong> - 
-                            온도: ${log.temperature}°C, 조도: ${log.light_level}, 
-                            상태: <strong>${log.safety_level.toUpperCase()}</strong>
-                        </div>
-                    `).join('');
-                    
-                } catch (error) {
-                    console.error('로그 로딩 실패:', error);
-                    document.getElementById('log-entries').innerHTML = '<p>로그 로딩 실패</p>';
-                }
-            }
-            
-            function refreshData() {
-                fetchStatus();
-                fetchLogs();
+# HTTP caching settings
+MIN_COMPRESS_SIZE = 512  # bytes; smaller bodies are sent as-is
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Live stream settings
+WATCH_INTERVAL = 0.25      # seconds between log file change checks
+HEARTBEAT_INTERVAL = 15.0  # seconds of silence before a keep-alive comment
+SUBSCRIBER_QUEUE_SIZE = 32 # pending events per client before old ones drop
+INGEST_STOP_TIMEOUT = 5.0  # seconds to wait for the killed ingest process
+
+SAFETY_LEVELS = ["safe", "warning", "danger"]
+SAFETY_RANK = {level: rank for rank, level in enumerate(SAFETY_LEVELS)}
+LOG_FIELDS = ["timestamp", "temperature", "light_level", "safety_level", "readable_time", "door"]
+MAX_LOG_LIMIT = 1000
+PAGE_CACHE_SIZE = 64  # distinct /api/logs queries kept serialized per snapshot
+DEFAULT_HISTORY_POINTS = 500
+MAX_HISTORY_POINTS = 5000
+
+# Remote monitor ingest
+INGEST_TOKENS = {token.strip() for token in os.environ.get("SAFEKNOB_INGEST_TOKENS", "").split(",")
+                 if token.strip()}
+INGEST_COLUMNS = ["door", "timestamp", "temperature", "light_level", "safety_level"]
+MAX_INGEST_RECORDS = 10000       # per request
+MAX_REMOTE_ENTRIES = 100000      # remote readings kept in memory
+MAX_DOOR_ID_LENGTH = 64
+TEMPERATURE_RANGE = (-40.0, 200.0)
+LIGHT_RANGE = (0.0, 100.0)
+MAX_CLOCK_SKEW = 300.0           # seconds a reading may be ahead of our clock
+
+EMPTY_STATUS = {
+    "temperature": 0,
+    "light_level": 0,
+    "safety_level": "safe",
+    "last_update": "데이터 없음"
+}
+
+
+def accepted_encodings(accept_encoding):
+    """Content codings the client accepts, ignoring explicit q=0"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CachedBody:
+    """Response body with a strong ETag and lazily built compressed variants"""
+
+    def __init__(self, body, media_type):
+        self.body = body
+        self.media_type = media_type
+        self.etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+        self._variants = {}
+
+    def _variant(self, coding):
+        """Compress once per body; every later request reuses the bytes"""
+        if coding not in self._variants:
+            if coding == "br":
+                self._variants[coding] = brotli.compress(self.body)
+            else:
+                self._variants[coding] = gzip.compress(self.body, mtime=0)
+        return self._variants[coding]
+
+    def precompress(self):
+        if len(self.body) >= MIN_COMPRESS_SIZE:
+            self._variant("gzip")
+            if brotli is not None:
+                self._variant("br")
+        return self
+
+    def respond(self, accept_encoding=None, if_none_match=None,
+                cache_control="no-cache", headers=None):
+        coding = None
+        if len(self.body) >= MIN_COMPRESS_SIZE:
+            accepted = accepted_encodings(accept_encoding)
+            if brotli is not None and "br" in accepted:
+                coding = "br"
+            elif "gzip" in accepted:
+                coding = "gzip"
+
+        # Each encoding is a different representation and needs its own ETag
+        etag = f'"{self.etag}-{coding}"' if coding else f'"{self.etag}"'
+        response_headers = {
+            "ETag": etag,
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding"
+        }
+        if headers:
+            response_headers.update(headers)
+
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=response_headers)
+
+        if coding:
+            response_headers["Content-Encoding"] = coding
+            return Response(content=self._variant(coding), media_type=self.media_type,
+                            headers=response_headers)
+        return Response(content=self.body, media_type=self.media_type,
+                        headers=response_headers)
+
+
+def etag_matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def load_static(name, media_type):
+    with open(os.path.join(STATIC_DIR, name), 'rb') as f:
+        return CachedBody(f.read(), media_type).precompress()
+
+
+def build_dashboard():
+    """Load the page and its assets, naming assets after their content hash"""
+    assets = {}
+    page = load_static("dashboard.html", "text/html; charset=utf-8").body.decode("utf-8")
+    for name, media_type in [("dashboard.css", "text/css; charset=utf-8"),
+                             ("dashboard.js", "text/javascript; charset=utf-8")]:
+        asset = load_static(name, media_type)
+        stem, ext = os.path.splitext(name)
+        hashed_name = f"{stem}.{asset.etag}{ext}"
+        assets[hashed_name] = asset
+        placeholder = "{{" + name.replace(".", "_") + "}}"
+        page = page.replace(placeholder, f"/assets/{hashed_name}")
+
+    page_body = CachedBody(page.encode("utf-8"), "text/html; charset=utf-8")
+    return page_body.precompress(), assets
+
+
+DASHBOARD_PAGE, ASSETS = build_dashboard()
+
+
+class LogCache:
+    """Parsed SafeKnob log kept in memory, reloaded only when the file changes"""
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.logs = []
+        self.file_logs = []
+        self.remote_logs = []
+        self.doors = {}
+        self.status = EMPTY_STATUS
+        self.status_body = CachedBody(json.dumps(EMPTY_STATUS).encode("utf-8"), "application/json")
+        self.version = 0
+        self._logs_body = b"[]"
+        self._timestamps = []
+        self._pages = {}
+        self._history = {}
+        self._series = None
+        self._signature = None
+        self._lock = threading.Lock()
+        # New readings in arrival order, for the live stream; late remote
+        # batches sort behind newer entries, so timestamps can't find them
+        self.added = deque(maxlen=MAX_INGEST_RECORDS)
+        self.added_count = 0
+
+    def _file_signature(self):
+        """Cheap change detector: inode, mtime and size of the log file"""
+        try:
+            st = os.stat(self.log_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def refresh(self):
+        """Reload the log if it changed since the last load"""
+        if self._file_signature() == self._signature:
+            return
+
+        # Only one reader parses the file; the others wait and reuse its result
+        with self._lock:
+            signature = self._file_signature()
+            if signature == self._signature:
+                return
+
+            if signature is None:
+                logs = []
+            else:
+                try:
+                    with open(self.log_file, 'r') as f:
+                        logs = json.load(f)
+                except json.JSONDecodeError:
+                    # Writer is mid-dump; keep serving the previous snapshot
+                    return
+
+            self._add(newer_than(logs, self.file_logs[-1]["timestamp"] if self.file_logs else None))
+            self.file_logs = logs
+            self._apply(self._merged())
+            self._signature = signature
+
+    def _merged(self):
+        """Local file log and remote readings as one timestamp-ordered list"""
+        if not self.remote_logs:
+            return self.file_logs
+        # Two sorted runs: Timsort merges them in linear time
+        return sorted(self.file_logs + self.remote_logs, key=itemgetter("timestamp"))
+
+    def ingest(self, entries):
+        """Add timestamp-sorted remote readings in one snapshot swap"""
+        if not entries:
+            return
+        with self._lock:
+            first = entries[0]["timestamp"]
+            remote = self.remote_logs
+            in_order = not self.logs or first >= self.logs[-1]["timestamp"]
+            if remote and first < remote[-1]["timestamp"]:
+                remote = sorted(remote + entries, key=itemgetter("timestamp"))
+            else:
+                remote = remote + entries
+
+            # Trim with some slack so a full buffer doesn't force a merge per batch
+            if len(remote) > MAX_REMOTE_ENTRIES * 1.1:
+                remote = remote[-MAX_REMOTE_ENTRIES:]
+                in_order = False
+            self.remote_logs = remote
+
+            for entry in entries:
+                door = self.doors.get(entry["door"])
+                if door is None or entry["timestamp"] >= door["timestamp"]:
+                    self.doors[entry["door"]] = entry
+
+            self._add(entries)
+            self._apply(self.logs + entries if in_order else self._merged())
+
+    def _add(self, entries):
+        self.added.extend(entries)
+        self.added_count += len(entries)
+
+    def added_since(self, count):
+        """Readings added after the first `count` ever added, and the new count.
+        The oldest are missing if more than the journal holds arrived since."""
+        with self._lock:
+            new = min(self.added_count - count, len(self.added))
+            return list(itertools.islice(self.added, len(self.added) - new, None)), self.added_count
+
+    @property
+    def logs_body(self):
+        """Compact JSON of the whole log, serialized on first use per snapshot"""
+        if self._logs_body is None:
+            self._logs_body = json.dumps(
+                self.logs, ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+        return self._logs_body
+
+    @property
+    def timestamps(self):
+        if self._timestamps is None:
+            self._timestamps = [entry["timestamp"] for entry in self.logs]
+        return self._timestamps
+
+    def current_readings(self):
+        """Latest reading of every source: the local monitor and each remote door"""
+        readings = list(self.doors.values())
+        if self.file_logs:
+            readings.append(self.file_logs[-1])
+        return readings
+
+    def _apply(self, logs, logs_body=None):
+        """Swap in a new snapshot; views of it are built lazily on first use.
+
+        The headline status is the worst current reading across sources
+        (newest on a tie), so one door reporting SAFE can't hide another
+        that is in DANGER.
+        """
+        readings = self.current_readings()
+        if readings:
+            latest = max(readings, key=lambda entry: (SAFETY_RANK.get(entry["safety_level"], -1),
+                                                      entry["timestamp"]))
+            status = {
+                "temperature": latest["temperature"],
+                "light_level": latest["light_level"],
+                "safety_level": latest["safety_level"],
+                "last_update": latest["readable_time"]
             }
-            
-            // Auto refresh every 5 seconds
-            setInterval(refreshData, 5000);
-            
-            // Initial load
-            refreshData();
-        </script>
-    </body>
-    </html>
+        else:
+            status = EMPTY_STATUS
+
+        self.logs = logs
+        self.status = status
+        self.status_body = CachedBody(
+            json.dumps(status, ensure_ascii=False).encode("utf-8"), "application/json"
+        )
+        self._logs_body = logs_body
+        self._timestamps = None
+        self._pages = {}
+        self._history = {}
+        self._series = None
+        self.version += 1
+
+    def query(self, since=None, until=None, level=None, limit=None, before=None):
+        """Entries in [since, until] and before the `before` position, oldest first.
+
+        `before` is (timestamp, skip): entries older than timestamp, plus
+        those at timestamp except the newest `skip` of them (skip None
+        excludes them all). Entries often share a timestamp (ingest
+        batches), so the timestamp alone can't mark where a page ended.
+
+        Returns (entries, next_before). The log is sorted by timestamp, so the
+        range is found by bisection and only the newest `limit` matches are
+        collected by scanning backwards from its end.
+        """
+        timestamps = self.timestamps
+        lo = bisect_left(timestamps, since) if since is not None else 0
+        hi = bisect_right(timestamps, until) if until is not None else len(timestamps)
+        if before is not None:
+            timestamp, skip = before
+            if skip is None:
+                end = bisect_left(timestamps, timestamp)
+            else:
+                end = max(bisect_left(timestamps, timestamp),
+                          bisect_right(timestamps, timestamp) - skip)
+            hi = min(hi, end)
+
+        if level is None and limit is None:
+            return self.logs[lo:hi], None
+
+        matches = []
+        next_before = None
+        oldest = hi
+        for i in range(hi - 1, lo - 1, -1):
+            entry = self.logs[i]
+            if level is not None and entry["safety_level"] != level:
+                continue
+            if limit is not None and len(matches) == limit:
+                timestamp = matches[-1]["timestamp"]
+                next_before = (timestamp, bisect_right(timestamps, timestamp) - oldest)
+                break
+            matches.append(entry)
+            oldest = i
+
+        matches.reverse()
+        return matches, next_before
+
+    def page(self, since=None, until=None, level=None, limit=None, before=None,
+             fields=None):
+        """Serialized query result, memoized until the log changes"""
+        key = (since, until, level, limit, before, fields)
+        cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+
+        if key == (None,) * 6:
+            body, next_before = self.logs_body, None
+        else:
+            entries, next_before = self.query(since, until, level, limit, before)
+            if fields is not None:
+                entries = [{name: entry.get(name) for name in fields} for entry in entries]
+            body = json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+            body = body.encode("utf-8")
+
+        result = (CachedBody(body, "application/json"), next_before)
+
+        if len(self._pages) >= PAGE_CACHE_SIZE:
+            self._pages.clear()
+        self._pages[key] = result
+        return result
+
+    def series(self):
+        """Timestamp, temperature and light arrays for the current snapshot"""
+        if self._series is None:
+            self._series = tuple(
+                np.array([entry[name] for entry in self.logs], dtype=np.float64)
+                for name in ("timestamp", "temperature", "light_level")
+            )
+        return self._series
+
+    def history(self, since=None, until=None, points=DEFAULT_HISTORY_POINTS):
+        """Downsampled temperature/light series, memoized per range and budget"""
+        timestamps, temperature, light_level = self.series()
+        lo = int(np.searchsorted(timestamps, since, "left")) if since is not None else 0
+        hi = int(np.searchsorted(timestamps, until, "right")) if until is not None else len(timestamps)
+
+        # Keyed by resolved indices so moving windows over the same data hit
+        key = (lo, hi, points)
+        cached = self._history.get(key)
+        if cached is not None:
+            return cached
+
+        x = timestamps[lo:hi]
+        result = {}
+        for name, values in (("temperature", temperature), ("light_level", light_level)):
+            y = values[lo:hi]
+            selected = lttb(x, y, points)
+            result[name] = {"timestamp": x[selected].tolist(), "value": y[selected].tolist()}
+
+        body = CachedBody(json.dumps(result, separators=(",", ":")).encode("utf-8"),
+                          "application/json")
+        if len(self._history) >= PAGE_CACHE_SIZE:
+            self._history.clear()
+        self._history[key] = body
+        return body
+
+
+def newer_than(logs, timestamp):
+    """Tail of the timestamp-ordered `logs` after `timestamp` (all of it for None)"""
+    if timestamp is None:
+        return logs
+    start = len(logs)
+    while start and logs[start - 1]["timestamp"] > timestamp:
+        start -= 1
+    return logs[start:]
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling; returns selected indices.
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the next bucket's average. Bucket averages
+    and per-bucket areas are vectorized; only the walk over buckets is
+    sequential, so cost is O(n) with a loop of `threshold` iterations.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    # Third vertex for bucket i is the average of bucket i + 1 (last point for the final bucket)
+    next_x = np.append(avg_x[1:], x[n - 1])
+    next_y = np.append(avg_y[1:], y[n - 1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[start:end] - ay)
+                      - (ax - x[start:end]) * (next_y[i] - ay))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+class SharedLogCache(LogCache):
+    """LogCache fed from the ingest process's shared-memory segment.
+
+    The change check is a single read of the segment's sequence number,
+    so requests between updates cost no lock, copy or parse. A worker
+    decodes the payload once per update.
+    """
+
+    def __init__(self, name):
+        super().__init__(None)
+        self.reader = SharedStateReader(name)
+
+    def refresh(self):
+        if self.reader.seq() in (None, self._signature):
+            return
+
+        with self._lock:
+            snapshot = self.reader.read()
+            if snapshot is None or snapshot[0] == self._signature:
+                return
+            seq, logs_body = snapshot
+            # The ingest process publishes the local file log
+            logs = json.loads(logs_body)
+            self._add(newer_than(logs, self.file_logs[-1]["timestamp"] if self.file_logs else None))
+            self.file_logs = logs
+            self._apply(self._merged(), None if self.remote_logs else logs_body)
+            self._signature = seq
+
+
+def run_ingest(writer):
+    """Ingest process: watch the log file and publish it to shared memory.
+
+    Ignores SIGINT and SIGTERM: a signal sent to the whole process group
+    must leave shutdown to the parent, which kills this process and then
+    unlinks the segment it created.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    cache = LogCache(LOG_FILE)
+    published_version = None
+    while True:
+        try:
+            cache.refresh()
+        except Exception as e:
+            print(f"Ingest error: {e}")
+        if cache.version != published_version:
+            logs_body = cache.logs_body
+            logs = cache.logs
+            # Keep the newest entries that fit in the segment
+            while not writer.publish(logs_body) and logs:
+                logs = logs[len(logs) // 2 + 1:]
+                logs_body = json.dumps(
+                    logs, ensure_ascii=False, separators=(",", ":")
+                ).encode("utf-8")
+            published_version = cache.version
+        time.sleep(WATCH_INTERVAL)
+
+
+def json_number(value):
+    """`value` as a float if it is a JSON number (not a bool), else NaN"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return np.nan
+    try:
+        return float(value)
+    except OverflowError:  # an int beyond float range
+        return np.nan
+
+
+def numeric_column(values):
+    """float64 array of a JSON column; anything but a number becomes NaN.
+
+    Built element by element: np.array() would coerce "20" and True to
+    numbers and raise on nested lists.
+    """
+    return np.fromiter(map(json_number, values), dtype=np.float64, count=len(values))
+
+
+def validate_readings(payload, now=None):
+    """Check a columnar ingest payload with array operations.
+
+    Returns (entries sorted by timestamp, indices of rejected rows). A
+    row is rejected if any of its values is missing, out of range or of
+    the wrong type; the rest of the batch is still accepted.
     """
-    return html_content
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Body must be a JSON object of columns")
+    missing = [name for name in INGEST_COLUMNS if not isinstance(payload.get(name), list)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing)}")
+    count = len(payload["timestamp"])
+    if any(len(payload[name]) != count for name in INGEST_COLUMNS):
+        raise HTTPException(status_code=400, detail="Columns must have the same length")
+    if count > MAX_INGEST_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_INGEST_RECORDS} records per request")
+
+    now = time.time() if now is None else now
+    timestamps = numeric_column(payload["timestamp"])
+    temperature = numeric_column(payload["temperature"])
+    light_level = numeric_column(payload["light_level"])
+    levels = payload["safety_level"]
+    doors = payload["door"]
+
+    valid = (
+        (timestamps > 0) & (timestamps <= now + MAX_CLOCK_SKEW)
+        & (temperature >= TEMPERATURE_RANGE[0]) & (temperature <= TEMPERATURE_RANGE[1])
+        & (light_level >= LIGHT_RANGE[0]) & (light_level <= LIGHT_RANGE[1])
+        & np.fromiter((isinstance(level, str) and level in SAFETY_RANK
+                       for level in levels), dtype=bool, count=count)
+        & np.fromiter((isinstance(door, str) and 0 < len(door) <= MAX_DOOR_ID_LENGTH
+                       for door in doors), dtype=bool, count=count)
+    )  # NaN fails every comparison, so non-numbers are rejected here too
+
+    accepted = np.flatnonzero(valid)
+    accepted = accepted[np.argsort(timestamps[accepted], kind="stable")]
+    entries = []
+    second, readable_time = None, None
+    for i, timestamp, temp, light in zip(
+        accepted.tolist(), timestamps[accepted].tolist(),
+        temperature[accepted].tolist(), light_level[accepted].tolist()
+    ):
+        # Sorted, so readings from the same second share one formatted time
+        if int(timestamp) != second:
+            second = int(timestamp)
+            readable_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        entries.append({
+            "timestamp": timestamp,
+            "temperature": temp,
+            "light_level": light,
+            "safety_level": levels[i],
+            "readable_time": readable_time,
+            "door": doors[i]
+        })
+    return entries, np.flatnonzero(~valid).tolist()
+
+
+def check_ingest_token(authorization):
+    if not INGEST_TOKENS:
+        raise HTTPException(status_code=503, detail="Ingest is disabled (set SAFEKNOB_INGEST_TOKENS)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not any(
+        hmac.compare_digest(token.strip(), known) for known in INGEST_TOKENS
+    ):
+        raise HTTPException(status_code=401, detail="Invalid ingest token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+def encode_cursor(before):
+    """Opaque pagination cursor for the (timestamp, skip) position `before`"""
+    timestamp, skip = before
+    raw = json.dumps({"before": timestamp, "skip": skip}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        skip = position.get("skip")
+        if skip is not None and (not isinstance(skip, int) or skip < 0):
+            raise ValueError("skip")
+        return float(position["before"]), skip
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields):
+    """Validate a comma separated projection list"""
+    if not fields:
+        return None
+    names = tuple(name.strip() for name in fields.split(",") if name.strip())
+    unknown = [name for name in names if name not in LOG_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Events message"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+class EventHub:
+    """Fan-out of dashboard events to every connected stream client"""
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.dropped = 0
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, event, data):
+        """Encode once and enqueue for all clients without ever blocking"""
+        message = format_event(event, data)
+        for queue in self.subscribers:
+            if queue.full():
+                # Slow client: drop its oldest event rather than stall the hub
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+
+log_cache = SharedLogCache(SHARED_STATE_NAME) if SHARED_STATE_NAME else LogCache(LOG_FILE)
+event_hub = EventHub()
+alert_bus = AlertBus("safeknob_web")
+
+
+async def watch_log():
+    """Publish new readings and status changes as soon as the log changes"""
+    last_version = log_cache.version
+    last_added = log_cache.added_count
+    last_status = log_cache.status
+
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL)
+        try:
+            log_cache.refresh()
+        except Exception as e:
+            print(f"Log watch error: {e}")
+            continue
+
+        if log_cache.version == last_version:
+            continue
+        last_version = log_cache.version
+
+        # In arrival order, so a late batch from a slow door is still streamed
+        entries, last_added = log_cache.added_since(last_added)
+        for entry in entries:
+            event_hub.publish("reading", entry)
+
+        # Any field, not just the level: a door in DANGER keeps heating up
+        status = log_cache.status
+        if status != last_status:
+            last_status = status
+            event_hub.publish("status", status)
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Load the log once and start watching it for the live stream"""
+    log_cache.refresh()
+    asyncio.create_task(watch_log())
+
+    # Alerts from the bus reach dashboards without waiting for the log file
+    loop = asyncio.get_running_loop()
+
+    def forward_alert(alert):
+        payload = {
+            "topic": alert.topic,
+            "level": alert.level,
+            "source": alert.source,
+            "message": alert.message,
+            "data": alert.data,
+            "timestamp": datetime.fromtimestamp(alert.sent_ns / 1e9).isoformat()
+        }
+        loop.call_soon_threadsafe(event_hub.publish, "alert", payload)
+
+    alert_bus.subscribe(["safeknob"], forward_alert)
+
+@app.get("/", response_class=HTMLResponse)
+async def dashboard(
+    accept_encoding: str | None = Header(None),
+    if_none_match: str | None = Header(None)
+):
+    """Main dashboard page"""
+    return DASHBOARD_PAGE.respond(accept_encoding, if_none_match, "no-cache")
+
+@app.get("/assets/{name}")
+async def get_asset(
+    name: str,
+    accept_encoding: str | None = Header(None),
+    if_none_match: str | None = Header(None)
+):
+    """Content-addressed dashboard assets, cacheable forever"""
+    asset = ASSETS.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return asset.respond(accept_encoding, if_none_match, IMMUTABLE_CACHE_CONTROL)
 
 @app.get("/api/status")
-async def get_status():
+async def get_status(
+    accept_encoding: str | None = Header(None),
+    if_none_match: str | None = Header(None)
+):
     """Get current safety status"""
     try:
-        if not os.path.exists(LOG_FILE):
-            return {
-                "temperature": 0,
-                "light_level": 0,
-                "safety_level": "safe",
-                "last_update": "데이터 없음"
-            }
-        
-        with open(LOG_FILE, 'r') as f:
-            logs = json.load(f)
-        
-        if not logs:
-            return {
-                "temperature": 0,
-                "light_level": 0,
-                "safety_level": "safe", 
-                "last_update": "데이터 없음"
-            }
-        
-        latest = logs[-1]
-        return {
-            "temperature": latest["temperature"],
-            "light_level": latest["light_level"],
-            "safety_level": latest["safety_level"],
-            "last_update": latest["readable_time"]
-        }
+        log_cache.refresh()
+        return log_cache.status_body.respond(accept_encoding, if_none_match)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Status read error: {e}")
 
 @app.get("/api/logs")
-async def get_logs():
-    """Get recent logs"""
+async def get_logs(
+    since: float | None = None,
+    until: float | None = None,
+    level: str | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_LOG_LIMIT),
+    cursor: str | None = None,
+    fields: str | None = None,
+    accept_encoding: str | None = Header(None),
+    if_none_match: str | None = Header(None)
+):
+    """Get logs, optionally filtered and paginated newest-first.
+
+    The body stays a plain array (oldest first); the cursor for the next,
+    older page is returned in the X-Next-Cursor header.
+    """
+    if level is not None and level not in SAFETY_LEVELS:
+        raise HTTPException(status_code=400, detail="Invalid safety level")
+    projection = parse_fields(fields)
+    before = decode_cursor(cursor) if cursor else None
+
     try:
-        if not os.path.exists(LOG_FILE):
-            return []
-        
-        with open(LOG_FILE, 'r') as f:
-            logs = json.load(f)
-        
-        return logs
+        log_cache.refresh()
+        body, next_before = log_cache.page(since, until, level, limit, before, projection)
+        headers = {}
+        if next_before is not None:
+            headers["X-Next-Cursor"] = encode_cursor(next_before)
+        return body.respond(accept_encoding, if_none_match, headers=headers)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Logs read error: {e}")
 
+@app.get("/api/history")
+async def get_history(
+    since: float | None = None,
+    until: float | None = None,
+    points: int = Query(DEFAULT_HISTORY_POINTS, ge=3, le=MAX_HISTORY_POINTS),
+    accept_encoding: str | None = Header(None),
+    if_none_match: str | None = Header(None)
+):
+    """Temperature and light history downsampled to at most `points` per series"""
+    try:
+        log_cache.refresh()
+        return log_cache.history(since, until, points).respond(accept_encoding, if_none_match)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"History read error: {e}")
+
+@app.get("/api/doors")
+async def get_doors():
+    """Latest reading from every remote door monitor"""
+    return {
+        door: {
+            "temperature": entry["temperature"],
+            "light_level": entry["light_level"],
+            "safety_level": entry["safety_level"],
+            "last_update": entry["readable_time"]
+        } for door, entry in sorted(log_cache.doors.items())
+    }
+
+@app.post("/api/ingest")
+async def ingest_readings(request: Request, authorization: str | None = Header(None)):
+    """Bulk readings from remote monitors, one column per field.
+
+    Body: {"door": [...], "timestamp": [...], "temperature": [...],
+    "light_level": [...], "safety_level": [...]}
+    """
+    check_ingest_token(authorization)
+    if isinstance(log_cache, SharedLogCache):
+        # Workers only read the shared segment; ingest would update one worker
+        raise HTTPException(status_code=503, detail="Ingest needs the single-worker dashboard")
+
+    try:
+        payload = json.loads(await request.body())
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+
+    entries, rejected = validate_readings(payload)
+    log_cache.ingest(entries)
+    return {"accepted": len(entries), "rejected": len(rejected), "rejected_rows": rejected[:20]}
+
+@app.get("/api/stream")
+async def stream_events():
+    """Server-Sent Events stream of readings and status changes"""
+    queue = event_hub.subscribe()
+
+    async def event_source():
+        try:
+            yield format_event("status", log_cache.status)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    message = b": heartbeat\n\n"
+                yield message
+        finally:
+            event_hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/alert/{level}")
 async def trigger_alert(level: str):
     """Manually trigger alert for testing"""
-    valid_levels = ["safe", "warning", "danger"]
-    if level not in valid_levels:
+    if level not in SAFETY_LEVELS:
         raise HTTPException(status_code=400, detail="Invalid alert level")
     
-    # This would send alert to connected devices
-    # For demo purposes, we'll just log it
+    # Sent to connected devices over the alert bus; open dashboards get it
+    # back through our own subscription, or directly if the bus is down
     print(f"Manual alert triggered: {level}")
+    timestamp = datetime.now().isoformat()
+    if not alert_bus.publish(TOPIC_SAFEKNOB_ALERT, level, "Manual alert"):
+        event_hub.publish("alert", {"level": level, "timestamp": timestamp})
     
-    return {"message": f"Alert {level} triggered", "timestamp": datetime.now().isoformat()}
+    return {"message": f"Alert {level} triggered", "timestamp": timestamp}
 
 if __name__ == "__main__":
+    import argparse
+    import multiprocessing
     import uvicorn
+
+    parser = argparse.ArgumentParser(description="SafeKnob web dashboard")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="uvicorn workers; >1 adds a shared-memory ingest process")
+    args = parser.parse_args()
+
     print("🔥 SafeKnob Web Dashboard Starting...")
-    print("Dashboard: http://localhost:8001")
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    print(f"Dashboard: http://localhost:{WEB_PORT}")
+    if args.workers <= 1:
+        uvicorn.run(app, host="0.0.0.0", port=WEB_PORT)
+    else:
+        name = f"safeknob_{os.getpid()}"
+        writer = SharedStateWriter(name)
+        ingest = multiprocessing.Process(target=run_ingest, args=(writer,))
+        try:
+            ingest.start()
+            # Workers import this module fresh and pick the segment up from the environment
+            os.environ["SAFEKNOB_SHARED_STATE"] = name
+            uvicorn.run("safeknob_web:app", host="0.0.0.0", port=WEB_PORT, workers=args.workers)
+        finally:
+            if ingest.is_alive():
+                # It ignores SIGTERM, so terminate() would only time out
+                ingest.kill()
+                ingest.join(INGEST_STOP_TIMEOUT)
+            writer.close()
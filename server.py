@@ -1,14 +1,30 @@
+import asyncio
+import json
 import os
-import uvicorn
 import platform
+import shutil
 import subprocess
-from fastapi import FastAPI
-from gtts import gTTS
+import threading
+import time
+from fastapi import FastAPI, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from discovery import DiscoveryResponder
+from alert_bus import AlertBus, TOPIC_SAFEKNOB_ALERT, TOPIC_SAFEKNOB_LEVEL, TOPIC_SPEAK
+from latency_trace import Tracer
+from telemetry import SESSION_ID_PATTERN, batch_spans
+from tts_cache import SpeechCache, TEMPLATES
 
 # --- Audio Configuration ---
 AUDIO_DIR = "tts_audio"
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
+TELEMETRY_DIR = "telemetry"
+os.makedirs(TELEMETRY_DIR, exist_ok=True)
+MAX_TELEMETRY_REQUEST = 1024 * 1024
+
 TTS_MESSAGES = [
     "먼저 안전핀을 회전시켜 안전줄을 제거해주세요.",
     "좋습니다. 이제 소화기를 바닥에 내려놓고 몸통을 잡아주세요.",
@@ -19,19 +35,71 @@ TTS_MESSAGES = [
     "발사! 발사! 발사! 발사!",
     "이제 자세를 낮추고 안전한 곳으로 대피하세요."
 ]
+EVACUATION_INDEX = 7
+
+alert_bus = AlertBus("gfire_server")
+evacuation_lock = threading.Lock()
+playback_lock = threading.Lock()  # one message at a time, whichever endpoint asked
+tracer = Tracer("server")
+speech_cache = SpeechCache()
+
+MAX_TEXT_LENGTH = 200
+MAX_SLOT_LENGTH = 40   # characters per template slot value
+SERVER_PORT = int(os.environ.get("GFIRE_SERVER_PORT", "8000"))  # announced to discovering clients
+
+# gtts (and its requests stack) is imported on first use, off the startup path
+gTTS = None
+sounds_ready = threading.Event()  # set once prepare_all_sounds() has run
+SOUNDS_WAIT = 10.0                # seconds a speak request waits for its audio at startup
+
+FIRST_SAMPLE_TIMEOUT = 2.0  # seconds to watch a new player for its audio output
+PLAYBACK_HEARTBEAT = 0.5    # seconds between keep-alive bytes while a message plays
+
+def wait_for_audio_output(process, trace_id):
+    """
+    Marks first_sample once the player opens an ALSA device or a sound
+    server socket (Linux /proc), the closest observable proxy for the
+    first sample reaching the output.
+    """
+    fd_dir = f"/proc/{process.pid}/fd"
+    deadline = time.monotonic() + FIRST_SAMPLE_TIMEOUT
+    while process.poll() is None and time.monotonic() < deadline:
+        try:
+            for fd in os.listdir(fd_dir):
+                target = os.readlink(os.path.join(fd_dir, fd))
+                if target.startswith("/dev/snd/") or target.startswith("socket:"):
+                    tracer.mark(trace_id, "first_sample")
+                    return
+        except OSError:
+            return
+        time.sleep(0.001)
 
-def play_audio_cross_platform(audio_file):
+def run_player(command, trace_id=None, on_start=None):
+    """Runs an audio player to completion, tracing its startup."""
+    process = subprocess.Popen(command)
+    tracer.mark(trace_id, "spawn", player=command[0])
+    if on_start:
+        on_start()
+    if tracer.enabled and trace_id and os.path.isdir("/proc"):
+        wait_for_audio_output(process, trace_id)
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+def play_audio_cross_platform(audio_file, trace_id=None, on_start=None):
     """
     Cross-platform audio player using system commands.
+    `on_start()` is called once a player process is running.
     """
     system = platform.system().lower()
     
     try:
         if system == "windows":
             # Windows: use built-in media player with volume control
+            if on_start:
+                on_start()
             os.system(f'powershell -c "(New-Object Media.SoundPlayer \\"{audio_file}\\").PlaySync()"')
         elif system == "darwin":  # macOS
-            subprocess.run(["afplay", "-v", "3.0", audio_file], check=True)  # 200% 음량
+            run_player(["afplay", "-v", "3.0", audio_file], trace_id, on_start)  # 200% 음량
         elif system == "linux":
             # Try multiple Linux audio players in order of preference
             players = ["paplay", "aplay", "mpg123", "mpv", "vlc", "mplayer"]
@@ -46,17 +114,17 @@ def play_audio_cross_platform(audio_file):
                     
                     # Play audio with the available player
                     if player == "paplay":
-                        subprocess.run([player, "--volume=65536", audio_file], check=True)  # 200% volume (65536 = 4 * 16384)
+                        run_player([player, "--volume=65536", audio_file], trace_id, on_start)  # 200% volume (65536 = 4 * 16384)
                     elif player == "aplay":
-                        subprocess.run([player, audio_file], check=True)
+                        run_player([player, audio_file], trace_id, on_start)
                     elif player == "mpg123":
-                        subprocess.run([player, "-q", "-d", "50", "-f", "32768", audio_file], check=True)  # 200% volume with -f
+                        run_player([player, "-q", "-d", "50", "-f", "32768", audio_file], trace_id, on_start)  # 200% volume with -f
                     elif player == "mpv":
-                        subprocess.run([player, "--no-video", "--speed=1.2", "--volume=200", audio_file], check=True)  # 400% volume
+                        run_player([player, "--no-video", "--speed=1.2", "--volume=200", audio_file], trace_id, on_start)  # 400% volume
                     elif player == "vlc":
-                        subprocess.run([player, "--no-video", "--speed=1.2", "--volume=200", audio_file], check=True)  # 400% volume
+                        run_player([player, "--no-video", "--speed=1.2", "--volume=200", audio_file], trace_id, on_start)  # 400% volume
                     elif player == "mplayer":
-                        subprocess.run([player, "--no-video", "--speed=1.2", "-volume", "200", audio_file], check=True)  # 400% volume
+                        run_player([player, "--no-video", "--speed=1.2", "-volume", "200", audio_file], trace_id, on_start)  # 400% volume
                     
                     print(f"Successfully played audio using {player}")
                     return True
@@ -73,6 +141,10 @@ def play_audio_cross_platform(audio_file):
                 pygame.mixer.music.load(audio_file)
                 pygame.mixer.music.set_volume(2.5)  # 250% volume (though pygame typically caps at 1.0)
                 pygame.mixer.music.play()
+                tracer.mark(trace_id, "spawn", player="pygame")
+                tracer.mark(trace_id, "first_sample")
+                if on_start:
+                    on_start()
                 while pygame.mixer.music.get_busy():
                     pygame.time.wait(100)
                 pygame.mixer.quit()
@@ -92,71 +164,302 @@ def play_audio_cross_platform(audio_file):
 
 def prepare_all_sounds():
     """Generates all TTS audio files if they don't exist."""
+    global gTTS
     for i, msg in enumerate(TTS_MESSAGES):
         audio_file = os.path.join(AUDIO_DIR, f"speech_{i}.mp3")
         if not os.path.exists(audio_file):
             print(f"Generating TTS audio for index {i}: '{msg}'")
             try:
+                if gTTS is None:
+                    from gtts import gTTS
                 tts = gTTS(text=msg, lang='ko')
-                tts.save(audio_file)
+                # Requests are already being served: never expose a partial file
+                partial = f"{audio_file}.part"
+                tts.save(partial)
+                os.replace(partial, audio_file)
                 print(f"Audio file saved: {audio_file}")
             except Exception as e:
                 print(f"Failed to generate TTS for index {i}: {e}")
 
-app = FastAPI()
+def prepare_audio():
+    """Startup work that can run while the server already accepts requests."""
+    try:
+        prepare_all_sounds()
+    finally:
+        sounds_ready.set()
+    report_audio_players()
+    prerender_templates()
 
-@app.on_event("startup")
-async def startup_event():
-    """Prepare all sound files when the server starts."""
-    prepare_all_sounds()
-    
-    # Print system information
+def report_audio_players():
+    """Print system information and the audio players found."""
     system = platform.system()
     print(f"Running on {system} system")
     
     # Check available audio players on Linux
     if system.lower() == "linux":
         players = ["paplay", "aplay", "mpg123", "mpv", "vlc", "mplayer"]
-        available_players = []
-        
-        for player in players:
-            try:
-                subprocess.run(["which", player], 
-                             check=True, 
-                             stdout=subprocess.DEVNULL, 
-                             stderr=subprocess.DEVNULL)
-                available_players.append(player)
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                continue
+        available_players = [player for player in players if shutil.which(player)]
         
         if available_players:
             print(f"Available audio players: {', '.join(available_players)}")
         else:
             print("Warning: No standard audio players found. Will try pygame as fallback.")
 
+def prerender_templates():
+    """Warms the speech cache with the fixed parts of every template."""
+    try:
+        speech_cache.prerender()
+        print(f"Template fragments ready ({speech_cache.engine.name}): {speech_cache.stats}")
+    except Exception as e:
+        print(f"Failed to pre-render template fragments: {e}")
+
+def announce_evacuation():
+    """Play the evacuation message unless it is already playing"""
+    if not evacuation_lock.acquire(blocking=False):
+        return
+    try:
+        audio_file = os.path.join(AUDIO_DIR, f"speech_{EVACUATION_INDEX}.mp3")
+        print(f"DANGER alert received, playing: {TTS_MESSAGES[EVACUATION_INDEX]}")
+        with playback_lock:
+            play_audio_cross_platform(audio_file)
+        alert_bus.publish(TOPIC_SPEAK, "danger", TTS_MESSAGES[EVACUATION_INDEX],
+                          index=EVACUATION_INDEX)
+    except Exception as e:
+        print(f"Error playing evacuation message: {e}")
+    finally:
+        evacuation_lock.release()
+
+def on_safety_alert(alert):
+    """SafeKnob reported a level change or a manual alert; DANGER means evacuate"""
+    if alert.level == "danger":
+        # Keep the bus reader free while the audio plays
+        threading.Thread(target=announce_evacuation, daemon=True).start()
+
+app = FastAPI()
+
+@app.on_event("startup")
+async def startup_event():
+    """Prepare all sound files when the server starts.
+
+    TTS generation runs in the background so the server (and anything
+    sharing its event loop) comes up at once; /speak/{index} waits for a
+    message that isn't generated yet.
+    """
+    threading.Thread(target=prepare_audio, daemon=True).start()
+    try:
+        DiscoveryResponder(SERVER_PORT).start()
+        print(f"Answering LAN discovery for port {SERVER_PORT}")
+    except OSError as e:
+        print(f"Discovery responder unavailable: {e}")
+    alert_bus.subscribe([TOPIC_SAFEKNOB_LEVEL, TOPIC_SAFEKNOB_ALERT], on_safety_alert)
+
 @app.get("/")
 def read_root():
-    return {"message": "G-FIRE Assist Server is running. POST to /speak/{index} to play a message."}
+    # `time` lets clients estimate our clock offset for X-Speak-Deadline
+    return {"message": "G-FIRE Assist Server is running. POST to /speak/{index} or /speak/text to play a message.",
+            "time": time.time()}
+
+class SpeakText(BaseModel):
+    text: str
+    lang: str = "ko"
+
+class SpeakTemplate(BaseModel):
+    slots: dict[str, str | int | float] = {}
+    lang: str = "ko"
+
+# Plain (sync) handlers run in the threadpool, so identical concurrent
+# requests can meet in the speech cache and share one synthesis.
+@app.post("/speak/text")
+def speak_text(request: SpeakText, x_trace_id: str | None = Header(None)):
+    """
+    Synthesizes (or reuses) speech for arbitrary text and plays it.
+    """
+    text = request.text.strip()
+    tracer.mark(x_trace_id, "receive", text=text)
+    if not text or len(text) > MAX_TEXT_LENGTH:
+        return {"status": "error", "message": f"Text must be 1-{MAX_TEXT_LENGTH} characters."}
+    try:
+        audio_file = speech_cache.audio_file(text, request.lang)
+        print(f"Received request, playing text: {text}")
+        tracer.mark(x_trace_id, "enqueue")
+        with playback_lock:
+            play_audio_cross_platform(audio_file, x_trace_id)
+        tracer.mark(x_trace_id, "done")
+        alert_bus.publish(TOPIC_SPEAK, "safe", text)
+        return {"status": "success", "message_played": text}
+    except Exception as e:
+        print(f"Error speaking text '{text}': {e}")
+        return {"status": "error", "message": str(e)}
+
+@app.post("/speak/template/{name}")
+def speak_template(name: str, request: SpeakTemplate, x_trace_id: str | None = Header(None)):
+    """
+    Fills a template's slots and plays it, joined from cached fragments.
+    """
+    tracer.mark(x_trace_id, "receive", template=name)
+    if name not in TEMPLATES:
+        return {"status": "error", "message": f"Unknown template: {name}"}
+    slots = {slot: str(value).strip() for slot, value in request.slots.items()}
+    for slot, value in slots.items():
+        if not value or len(value) > MAX_SLOT_LENGTH:
+            return {"status": "error", "message": f"Slot {slot} must be 1-{MAX_SLOT_LENGTH} characters."}
+    try:
+        text = TEMPLATES[name].format(**slots)
+    except KeyError as e:
+        return {"status": "error", "message": f"Missing slot {e} for template {name}"}
+    if len(text) > MAX_TEXT_LENGTH:
+        return {"status": "error", "message": f"Text must be 1-{MAX_TEXT_LENGTH} characters."}
+    try:
+        audio_file, text = speech_cache.template_file(TEMPLATES[name], slots, request.lang)
+    except Exception as e:
+        print(f"Error rendering template {name}: {e}")
+        return {"status": "error", "message": str(e)}
+    try:
+        print(f"Received request, playing template {name}: {text}")
+        tracer.mark(x_trace_id, "enqueue")
+        with playback_lock:
+            play_audio_cross_platform(audio_file, x_trace_id)
+        tracer.mark(x_trace_id, "done")
+        alert_bus.publish(TOPIC_SPEAK, "safe", text, template=name)
+        return {"status": "success", "message_played": text}
+    except Exception as e:
+        print(f"Error playing template {name}: {e}")
+        return {"status": "error", "message": str(e)}
+
+@app.get("/speak/cache")
+def speak_cache_stats():
+    """Hit counters and sizes of the dynamic speech cache."""
+    return {
+        "engine": speech_cache.engine.name,
+        "stats": speech_cache.stats,
+        "memory_bytes": speech_cache.memory.size,
+        "disk_bytes": speech_cache.disk.size,
+        "disk_files": len(speech_cache.disk.files)
+    }
+
+async def start_playback(audio_file, index, trace_id):
+    """
+    Plays in a worker thread and returns its task once a player process
+    has started (or playback already ended, e.g. no player worked), so
+    the response headers only go out when playback has really begun.
+    Releases the playback lock when done.
+    """
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+
+    def play():
+        try:
+            play_audio_cross_platform(audio_file, trace_id,
+                                      on_start=lambda: loop.call_soon_threadsafe(started.set))
+            tracer.mark(trace_id, "done")
+            alert_bus.publish(TOPIC_SPEAK, "safe", TTS_MESSAGES[index], index=index)
+            return {"status": "success", "message_played": TTS_MESSAGES[index]}
+        except Exception as e:
+            print(f"Error playing sound for index {index}: {e}")
+            return {"status": "error", "message": str(e)}
+        finally:
+            playback_lock.release()
+
+    task = asyncio.ensure_future(asyncio.to_thread(play))
+    waiter = asyncio.ensure_future(started.wait())
+    await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    waiter.cancel()
+    return task
+
+async def stream_playback(task):
+    """
+    Streams whitespace at once and every PLAYBACK_HEARTBEAT seconds while
+    the message plays, then the JSON result.
+    """
+    yield b" "
+    while not task.done():
+        await asyncio.wait({task}, timeout=PLAYBACK_HEARTBEAT)
+        if not task.done():
+            yield b" "
+    yield json.dumps(task.result(), ensure_ascii=False).encode("utf-8")
 
 @app.post("/speak/{index}")
-async def speak_message(index: int):
+async def speak_message(
+    index: int,
+    x_trace_id: str | None = Header(None),
+    x_speak_deadline: float | None = Header(None)
+):
     """
     Plays a pre-generated TTS message based on the index.
+
+    Messages play one at a time. X-Speak-Deadline (epoch seconds on our
+    clock) is the latest time playback may start; past it the request is
+    refused with 503 and nothing plays, so the client can safely try
+    another server, even if this request was held up before reaching us.
     """
+    tracer.mark(x_trace_id, "receive", index=index)
     if 0 <= index < len(TTS_MESSAGES):
         audio_file = os.path.join(AUDIO_DIR, f"speech_{index}.mp3")
+        if not os.path.exists(audio_file) and not sounds_ready.is_set():
+            # Still generating at startup; counts against the deadline
+            wait = x_speak_deadline - time.time() if x_speak_deadline is not None else SOUNDS_WAIT
+            await run_in_threadpool(sounds_ready.wait, max(0.0, wait))
         if os.path.exists(audio_file):
-            try:
-                print(f"Received request, playing message index {index}: {TTS_MESSAGES[index]}")
-                play_audio_cross_platform(audio_file)
-                return {"status": "success", "message_played": TTS_MESSAGES[index]}
-            except Exception as e:
-                print(f"Error playing sound for index {index}: {e}")
-                return {"status": "error", "message": str(e)}
+            timeout = x_speak_deadline - time.time() if x_speak_deadline is not None else -1
+            if x_speak_deadline is not None and timeout <= 0:
+                print(f"Refusing message index {index}: deadline passed {-timeout * 1000:.0f} ms ago")
+                return JSONResponse({"status": "expired", "message": "Speak deadline passed."},
+                                    status_code=503)
+            if not await run_in_threadpool(playback_lock.acquire, True, timeout):
+                print(f"Busy, refusing message index {index}: can't start before the deadline")
+                return JSONResponse({"status": "busy", "message": "Another message is playing."},
+                                    status_code=503)
+            print(f"Received request, playing message index {index}: {TTS_MESSAGES[index]}")
+            tracer.mark(x_trace_id, "enqueue")
+            task = await start_playback(audio_file, index, x_trace_id)
+            if task.done() and task.result()["status"] != "success":
+                # Nothing played, so the client may safely try another server
+                return JSONResponse(task.result(), status_code=503)
+            return StreamingResponse(stream_playback(task), media_type="application/json")
         else:
             return {"status": "error", "message": f"Audio file for index {index} not found."}
     else:
         return {"status": "error", "message": f"Invalid message index: {index}"}
 
+telemetry_lock = threading.Lock()  # appends stay whole batches across threadpool threads
+
+def append_telemetry(session_id, body):
+    with telemetry_lock, open(os.path.join(TELEMETRY_DIR, f"{session_id}.gftm"), 'ab') as f:
+        f.write(body)
+
+@app.post("/telemetry/{session_id}")
+async def ingest_telemetry(session_id: str, request: Request):
+    """
+    Appends binary telemetry batches to the session's file as received.
+    """
+    if not SESSION_ID_PATTERN.match(session_id):
+        return {"status": "error", "message": f"Invalid session id: {session_id}"}
+    too_large = {"status": "error", "message": "Telemetry request too large."}
+    try:
+        if int(request.headers.get("content-length", 0)) > MAX_TELEMETRY_REQUEST:
+            return too_large
+    except ValueError:
+        return {"status": "error", "message": "Invalid Content-Length."}
+
+    # Capped while reading, so a chunked or mislabelled body can't outgrow the limit
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_TELEMETRY_REQUEST:
+            return too_large
+        chunks.append(chunk)
+    body = b"".join(chunks)
+    try:
+        # Only the headers are checked; columns are stored without decoding
+        spans = batch_spans(body)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    await run_in_threadpool(append_telemetry, session_id, body)
+    return {"status": "success", "batches": len(spans),
+            "samples": sum(count for _, count in spans)}
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=SERVER_PORT)
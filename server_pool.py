@@ -0,0 +1,229 @@
+"""
+G-FIRE Speak Server Pool
+Health-checked set of speak servers; each speak command goes to the
+fastest healthy one and fails over when a server stalls
+
+A command is only retried on another server while the first one has not
+started playing. The server acknowledges the start by beginning its
+streamed response, and refuses (503) when playback cannot start before
+the X-Speak-Deadline the client sends. The deadline is expressed on the
+server's clock, using the offset estimated from probe replies, so a
+server that stalls and wakes up later won't play a message the client
+has already sent elsewhere: a message never plays twice.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from latency_trace import TRACE_HEADER
+
+PROBE_INTERVAL = 2.0       # seconds between health probes of every server
+PROBE_TIMEOUT = 1.0
+LATENCY_ALPHA = 0.3        # weight of the newest probe in the smoothed latency/clock offset
+FAILURES_BEFORE_DOWN = 2   # consecutive failed probes/requests before a server is skipped
+SPEAK_DEADLINE = 1.5       # seconds for a server to start playback before failing over
+MIN_SPEAK_BUDGET = 0.1     # seconds the server gets at least, whatever the latency
+REDISCOVER_AFTER = 10.0    # seconds without a healthy server before looking for new ones
+
+
+class ServerStats:
+    def __init__(self, url):
+        self.url = url
+        self.latency_ms = None  # smoothed GET / round trip
+        self.clock_offset = 0.0 # smoothed server clock minus ours (seconds)
+        self._offset_known = False
+        self.failures = 0
+        self.healthy = True     # optimistic until the first probe says otherwise (routing only)
+        self.last_ok = None     # time.monotonic() of the last successful probe/request
+        self.served = 0
+        self.lock = threading.Lock()
+        self.session = requests.Session()  # keep-alive for speak requests
+
+    def record_success(self, latency_ms, clock_offset=None):
+        with self.lock:
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += LATENCY_ALPHA * (latency_ms - self.latency_ms)
+            if clock_offset is not None:
+                if self._offset_known:
+                    self.clock_offset += LATENCY_ALPHA * (clock_offset - self.clock_offset)
+                else:
+                    self.clock_offset = clock_offset
+                    self._offset_known = True
+            self.failures = 0
+            self.healthy = True
+            self.last_ok = time.monotonic()
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= FAILURES_BEFORE_DOWN:
+                self.healthy = False
+
+    def describe(self):
+        latency = f"{self.latency_ms:.1f} ms" if self.latency_ms is not None else "?"
+        state = "up" if self.healthy else "down"
+        return f"{self.url} {state} {latency} served={self.served}"
+
+
+class ServerPool(threading.Thread):
+    """Background prober plus speak routing over a list of servers.
+
+    `rediscover` (optional) returns fresh server URLs and is called after
+    REDISCOVER_AFTER seconds with no healthy server; `on_change(urls)`
+    gets the healthy servers that have answered at least once, fastest
+    first, whenever that set changes. A server that was never reached is
+    still tried for speak commands but never reported, so a dead cached
+    URL is not saved again.
+    """
+
+    def __init__(self, urls, tracer=None, rediscover=None, on_change=None,
+                 probe_interval=PROBE_INTERVAL):
+        super().__init__(daemon=True)
+        self.servers = [ServerStats(url) for url in dict.fromkeys(urls)]
+        self.tracer = tracer
+        self.rediscover = rediscover
+        self.on_change = on_change
+        self.probe_interval = probe_interval
+        self.failovers = 0
+        self._servers_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._unhealthy_since = None
+        self._last_confirmed = set()
+
+    @property
+    def primary_url(self):
+        """URL the next speak command would go to"""
+        return self.ranked()[0].url
+
+    def add(self, urls):
+        with self._servers_lock:
+            known = {server.url for server in self.servers}
+            new = [ServerStats(url) for url in urls if url not in known]
+            self.servers = self.servers + new
+        return new
+
+    def ranked(self):
+        """Healthy servers by smoothed latency, then the rest by fewest failures"""
+        servers = self.servers
+        healthy = sorted(
+            (s for s in servers if s.healthy),
+            key=lambda s: s.latency_ms if s.latency_ms is not None else PROBE_TIMEOUT * 1000
+        )
+        down = sorted((s for s in servers if not s.healthy), key=lambda s: s.failures)
+        return healthy + down
+
+    def probe(self, server):
+        sent = time.time()
+        start = time.perf_counter()
+        try:
+            response = requests.get(f"{server.url}/", timeout=PROBE_TIMEOUT)
+            response.raise_for_status()
+            server_time = response.json().get("time")
+        except (requests.exceptions.RequestException, ValueError):
+            server.record_failure()
+            return
+        elapsed = time.perf_counter() - start
+        # NTP-style: the server read its clock about halfway through the round trip
+        offset = server_time - (sent + elapsed / 2) if isinstance(server_time, (int, float)) else None
+        server.record_success(elapsed * 1000, offset)
+
+    def probe_all(self):
+        servers = self.servers
+        with ThreadPoolExecutor(max_workers=len(servers)) as pool:
+            list(pool.map(self.probe, servers))
+
+        ranked = self.ranked()
+        confirmed = [server.url for server in ranked if server.healthy and server.last_ok is not None]
+        if set(confirmed) != self._last_confirmed:
+            self._last_confirmed = set(confirmed)
+            if confirmed and self.on_change:
+                self.on_change(confirmed)
+        if any(server.healthy for server in ranked):
+            self._unhealthy_since = None
+            return
+        now = time.monotonic()
+        if self._unhealthy_since is None:
+            self._unhealthy_since = now
+        elif self.rediscover and now - self._unhealthy_since >= REDISCOVER_AFTER:
+            self._unhealthy_since = now
+            new = self.add(self.rediscover())
+            if new:
+                print(f"\nDiscovered speak server(s): {', '.join(s.url for s in new)}")
+
+    def run(self):
+        while True:
+            self.probe_all()
+            if self._stop_event.wait(self.probe_interval):
+                return
+
+    def stop(self):
+        self._stop_event.set()
+
+    def speak(self, index, trace_id=None):
+        """Play message `index` on the best server; returns its URL, or None if none could"""
+        headers = {TRACE_HEADER: trace_id} if trace_id else {}
+        for attempt, server in enumerate(self.ranked()):
+            if attempt:
+                self.failovers += 1
+                print(f"Failing over to {server.url}")
+
+            # Playback must start early enough for the ack to reach us in time
+            budget = max(MIN_SPEAK_BUDGET, SPEAK_DEADLINE - (server.latency_ms or 0) / 1000)
+            headers["X-Speak-Deadline"] = f"{time.time() + server.clock_offset + budget:.3f}"
+            url = f"{server.url}/speak/{index}"
+            print(f"Calling endpoint: {url}")
+            if self.tracer:
+                self.tracer.mark(trace_id, "send", index=index, server=server.url)
+            try:
+                # Returns once the server starts streaming, i.e. playback has begun.
+                # The read timeout then spans the server's heartbeat bytes.
+                response = server.session.post(url, headers=headers, stream=True,
+                                               timeout=(SPEAK_DEADLINE, SPEAK_DEADLINE))
+            except requests.exceptions.RequestException as e:
+                print(f"Speak server {server.url} did not start in time: {e}")
+                server.record_failure()
+                continue
+
+            if response.status_code == 503:
+                # Refused before playing; safe to go elsewhere
+                try:
+                    refusal = response.json()
+                except ValueError:
+                    refusal = {}
+                response.close()
+                if refusal.get("status") in ("busy", "expired"):
+                    print(f"Speak server {server.url} is busy")
+                else:
+                    # No player could start there: not a healthy choice
+                    print(f"Speak server {server.url} could not play: {refusal.get('message')}")
+                    server.record_failure()
+                continue
+
+            # Playback has started: from here on never fail over
+            server.served += 1
+            try:
+                result = response.json()
+                if self.tracer:
+                    self.tracer.mark(trace_id, "ack", status=response.status_code)
+                response.raise_for_status()
+                if result.get("status") == "success":
+                    print("Server acknowledged speak request.")
+                else:
+                    print(f"Speak server reported: {result.get('message')}")
+                    server.record_failure()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Lost speak server {server.url} during playback: {e}")
+                server.record_failure()
+            return server.url
+
+        print(f"No speak server could play message {index}")
+        return None
+
+    def summary(self):
+        return (f"Speak servers (failovers={self.failovers}): "
+                + "; ".join(server.describe() for server in self.ranked()))
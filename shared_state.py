@@ -0,0 +1,136 @@
+"""
+SafeKnob Shared State
+Shared-memory segment holding the recent SafeKnob log,
+written by one ingest process and read by any number of web workers
+
+Layout (little endian):
+    0   magic      4s   b"SKNB"
+    4   layout     u32  LAYOUT_VERSION
+    8   seq        u64  seqlock counter, odd while a write is in progress
+    16  logs_len   u32
+    20  reserved   12 bytes
+    32  logs       remaining bytes of JSON (readers derive the status from it)
+
+Readers check `seq` first; when it is unchanged since their last read
+they keep using what they already decoded, without locking or copying.
+Otherwise they copy the payload and accept it only if `seq` was even
+and did not move while copying. The writer updates the length while
+`seq` is odd and makes `seq` even as its very last store, so an even
+`seq` is never paired with a half-written length.
+"""
+
+import struct
+import time
+from multiprocessing import shared_memory
+
+MAGIC = b"SKNB"
+LAYOUT_VERSION = 2
+HEADER = struct.Struct("<4sIQI12x")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+LENGTH = struct.Struct("<I")
+LENGTH_OFFSET = 16
+DEFAULT_SEGMENT_SIZE = 4 * 1024 * 1024
+READ_RETRIES = 1000
+
+
+def attach_segment(name):
+    """Open an existing segment without letting this process unlink it on exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track flag; undo the resource tracker registration
+        from multiprocessing import resource_tracker
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+class SharedStateWriter:
+    """Creates and owns the segment; only one process may write.
+
+    The launcher creates it and hands it to the ingest process, so the
+    segment is unlinked by its creator however the writer exits.
+    """
+
+    def __init__(self, name, size=DEFAULT_SEGMENT_SIZE):
+        try:
+            self.segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a crashed run; take it over
+            stale = shared_memory.SharedMemory(name=name)
+            stale.unlink()
+            stale.close()
+            self.segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = name
+        self.seq = 0
+        self.logs_capacity = self.segment.size - HEADER.size
+        HEADER.pack_into(self.segment.buf, 0, MAGIC, LAYOUT_VERSION, 0, 0)
+
+    def publish(self, logs_body):
+        """Replace the payload; returns False if it does not fit"""
+        if len(logs_body) > self.logs_capacity:
+            return False
+
+        buf = self.segment.buf
+        self.seq += 1
+        SEQ.pack_into(buf, SEQ_OFFSET, self.seq)  # odd: readers back off
+        buf[HEADER.size:HEADER.size + len(logs_body)] = logs_body
+        LENGTH.pack_into(buf, LENGTH_OFFSET, len(logs_body))
+        self.seq += 1
+        SEQ.pack_into(buf, SEQ_OFFSET, self.seq)  # even, last: the write is complete
+        return True
+
+    def close(self):
+        self.segment.close()
+        self.segment.unlink()
+
+
+class SharedStateReader:
+    """Lock-free reader; attaches lazily so workers may start before the writer"""
+
+    def __init__(self, name):
+        self.name = name
+        self.segment = None
+
+    def _attach(self):
+        if self.segment is None:
+            try:
+                self.segment = attach_segment(self.name)
+            except FileNotFoundError:
+                return False
+            magic, layout = HEADER.unpack_from(self.segment.buf, 0)[:2]
+            if magic != MAGIC or layout != LAYOUT_VERSION:
+                raise RuntimeError(f"Shared state {self.name} has an unknown layout")
+        return True
+
+    def seq(self):
+        """Current version, or None before the writer has created the segment"""
+        if not self._attach():
+            return None
+        return SEQ.unpack_from(self.segment.buf, SEQ_OFFSET)[0]
+
+    def read(self):
+        """Consistent (seq, logs_body) snapshot, or None if unavailable"""
+        if not self._attach():
+            return None
+
+        buf = self.segment.buf
+        for _ in range(READ_RETRIES):
+            seq = SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            if seq == 0:
+                return None  # nothing published yet
+            if seq % 2:
+                # A write is in progress; let the writer finish
+                time.sleep(0)
+                continue
+            logs_len = LENGTH.unpack_from(buf, LENGTH_OFFSET)[0]
+            logs_body = bytes(buf[HEADER.size:HEADER.size + logs_len])
+            if SEQ.unpack_from(buf, SEQ_OFFSET)[0] == seq:
+                return seq, logs_body
+        return None
+
+    def close(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
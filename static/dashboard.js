@@ -0,0 +1,183 @@
+const statusMap = {
+    'safe': '🟢 안전',
+    'warning': '🟡 주의',
+    'danger': '🔴 위험'
+};
+let recentLogs = [];
+let historyRange = 0;  // seconds back from now, 0 for everything
+const HISTORY_REFRESH_MS = 5000;  // pushed readings redraw the charts at most this often
+let lastHistoryFetch = 0;
+let historyTimer = null;
+
+function renderStatus(data) {
+    // Update status indicator
+    const statusDot = document.getElementById('status-dot');
+    const statusText = document.getElementById('status-text');
+
+    statusDot.className = 'status-dot ' + data.safety_level;
+    statusText.textContent = statusMap[data.safety_level] || '알 수 없음';
+
+    // Update metrics
+    document.getElementById('temperature').textContent = data.temperature + '°C';
+    document.getElementById('light-level').textContent = data.light_level;
+    document.getElementById('last-update').textContent = data.last_update;
+}
+
+function renderLogs() {
+    const logContainer = document.getElementById('log-entries');
+
+    if (recentLogs.length === 0) {
+        logContainer.innerHTML = '<p>로그 데이터가 없습니다.</p>';
+        return;
+    }
+
+    logContainer.innerHTML = recentLogs.slice().reverse().map(log => `
+        <div class="log-entry ${log.safety_level}">
+            <strong>${log.readable_time}</strong> -
+            온도: ${log.temperature}°C, 조도: ${log.light_level},
+            상태: <strong>${log.safety_level.toUpperCase()}</strong>
+        </div>
+    `).join('');
+}
+
+async function fetchStatus() {
+    try {
+        const response = await fetch('/api/status');
+        renderStatus(await response.json());
+    } catch (error) {
+        console.error('상태 업데이트 실패:', error);
+        document.getElementById('status-text').textContent = '연결 오류';
+    }
+}
+
+async function fetchLogs() {
+    try {
+        const response = await fetch('/api/logs?limit=10');
+        recentLogs = await response.json();
+        renderLogs();
+    } catch (error) {
+        console.error('로그 로딩 실패:', error);
+        document.getElementById('log-entries').innerHTML = '<p>로그 로딩 실패</p>';
+    }
+}
+
+function drawChart(canvas, series, color) {
+    // Size the backing store to the displayed width so one point maps to one pixel
+    const width = canvas.clientWidth * window.devicePixelRatio;
+    const height = canvas.clientHeight * window.devicePixelRatio;
+    canvas.width = width;
+    canvas.height = height;
+
+    const ctx = canvas.getContext('2d');
+    ctx.clearRect(0, 0, width, height);
+    if (series.timestamp.length === 0) {
+        return;
+    }
+
+    const pad = 30 * window.devicePixelRatio;
+    const xMin = series.timestamp[0];
+    const xMax = series.timestamp[series.timestamp.length - 1];
+    const yMin = Math.min(...series.value);
+    const yMax = Math.max(...series.value);
+    const xSpan = (xMax - xMin) || 1;
+    const ySpan = (yMax - yMin) || 1;
+
+    ctx.strokeStyle = color;
+    ctx.lineWidth = 2 * window.devicePixelRatio;
+    ctx.beginPath();
+    series.timestamp.forEach((t, i) => {
+        const x = pad + (t - xMin) / xSpan * (width - 2 * pad);
+        const y = height - pad - (series.value[i] - yMin) / ySpan * (height - 2 * pad);
+        if (i === 0) {
+            ctx.moveTo(x, y);
+        } else {
+            ctx.lineTo(x, y);
+        }
+    });
+    ctx.stroke();
+
+    ctx.fillStyle = '#7f8c8d';
+    ctx.font = (12 * window.devicePixelRatio) + 'px sans-serif';
+    ctx.fillText(yMax.toFixed(1), 2, pad);
+    ctx.fillText(yMin.toFixed(1), 2, height - pad);
+}
+
+async function fetchHistory() {
+    lastHistoryFetch = Date.now();
+    const chart = document.getElementById('temperature-chart');
+    const points = Math.min(5000, Math.max(3, Math.round(chart.clientWidth * window.devicePixelRatio)));
+    let url = '/api/history?points=' + points;
+    if (historyRange > 0) {
+        url += '&since=' + (Date.now() / 1000 - historyRange);
+    }
+
+    try {
+        const response = await fetch(url);
+        const history = await response.json();
+        drawChart(chart, history.temperature, '#e74c3c');
+        drawChart(document.getElementById('light-chart'), history.light_level, '#f39c12');
+    } catch (error) {
+        console.error('기록 로딩 실패:', error);
+    }
+}
+
+function scheduleHistory() {
+    // Every reading invalidates the server's downsampled history, so batch
+    // pushed readings into one refetch instead of one per reading per viewer
+    if (historyTimer !== null) {
+        return;
+    }
+    const wait = Math.max(0, lastHistoryFetch + HISTORY_REFRESH_MS - Date.now());
+    historyTimer = setTimeout(() => {
+        historyTimer = null;
+        fetchHistory();
+    }, wait);
+}
+
+function refreshData() {
+    fetchStatus();
+    fetchLogs();
+    fetchHistory();
+}
+
+document.querySelectorAll('.range-btn').forEach(button => {
+    button.addEventListener('click', () => {
+        document.querySelectorAll('.range-btn').forEach(b => b.classList.remove('active'));
+        button.classList.add('active');
+        historyRange = Number(button.dataset.range);
+        fetchHistory();
+    });
+});
+
+function connectStream() {
+    const source = new EventSource('/api/stream');
+
+    // Sent on connect and whenever any headline field changes
+    source.addEventListener('status', event => renderStatus(JSON.parse(event.data)));
+    source.addEventListener('alert', event => {
+        // Bus alerts arrive before the log catches up; show the level at once
+        const alert = JSON.parse(event.data);
+        document.getElementById('status-dot').className = 'status-dot ' + alert.level;
+        document.getElementById('status-text').textContent = statusMap[alert.level] || '알 수 없음';
+    });
+    source.addEventListener('reading', event => {
+        recentLogs.push(JSON.parse(event.data));
+        recentLogs = recentLogs.slice(-10);
+        renderLogs();
+        scheduleHistory();
+    });
+    // EventSource reconnects by itself; resync once it is back
+    source.addEventListener('open', refreshData);
+    source.addEventListener('error', () => {
+        document.getElementById('status-text').textContent = '연결 오류';
+    });
+}
+
+if (window.EventSource) {
+    // Live updates are pushed by the server
+    connectStream();
+} else {
+    // Auto refresh every 5 seconds
+    setInterval(refreshData, 5000);
+    refreshData();
+}
@@ -0,0 +1,315 @@
+"""
+G-FIRE Telemetry
+Sampled IMU/button telemetry from the extinguisher client, shipped to the
+server in compact columnar binary batches
+
+Batch layout (little endian):
+    header  <4sBBHd   magic b"GFTM", format version, reserved, sample count,
+                      t0 (epoch seconds of the first sample)
+    columns           one packed array per entry in COLUMNS, in order
+
+Batches are self-delimiting, so the server appends them to a per-session
+file as received and they can be read back with iter_batches().
+
+    python telemetry.py telemetry/<session>.gftm [--csv out.csv]
+"""
+
+import argparse
+import csv
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+MAGIC = b"GFTM"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBHd")
+CONTENT_TYPE = "application/x-gfire-telemetry"
+
+# (name, struct code) per column; t_us is the offset from the batch t0
+COLUMNS = [
+    ("t_us", "I"),
+    ("acc_x", "f"), ("acc_y", "f"), ("acc_z", "f"),
+    ("gyro_x", "f"), ("gyro_y", "f"), ("gyro_z", "f"),
+    ("angle_x", "f"), ("angle_y", "f"), ("angle_z", "f"),
+    ("pressed", "B"),
+    ("state", "b"),
+]
+SAMPLE_SIZE = sum(struct.calcsize(code) for _, code in COLUMNS)
+MAX_BATCH_SAMPLES = 0xFFFF
+
+SAMPLE_RATE = float(os.environ.get("GFIRE_TELEMETRY_HZ", "200"))
+FLUSH_INTERVAL = 1.0             # seconds between uploads
+MAX_PENDING_BATCHES = 300        # ~5 minutes at one batch per second while offline
+MAX_REQUEST_BYTES = 256 * 1024   # batches coalesced into one request when catching up
+UPLOAD_BYTES_PER_S = 64 * 1024   # leave the link to speak traffic
+UPLOAD_TIMEOUT = 5
+
+# requests is imported by TelemetryUploader only, so the server can use the
+# batch format without loading an HTTP client
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_session_id():
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+def encode_batch(t0, columns):
+    """Pack {name: [values]} (all columns the same length) into one batch"""
+    count = len(columns["t_us"])
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, 0, count, t0)]
+    for name, code in COLUMNS:
+        parts.append(struct.pack(f"<{count}{code}", *columns[name]))
+    return b"".join(parts)
+
+
+def batch_spans(data):
+    """[(offset, count)] for every batch in `data`; raises ValueError if malformed"""
+    spans = []
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < HEADER.size:
+            raise ValueError("Truncated batch header")
+        magic, version, _, count, _ = HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            raise ValueError("Not a telemetry batch")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported telemetry format version {version}")
+        end = offset + HEADER.size + count * SAMPLE_SIZE
+        if end > len(data):
+            raise ValueError("Truncated batch body")
+        spans.append((offset, count))
+        offset = end
+    return spans
+
+
+def iter_batches(data):
+    """Yields (t0, {name: tuple of values}) for every batch in `data`"""
+    for offset, count in batch_spans(data):
+        t0 = HEADER.unpack_from(data, offset)[4]
+        position = offset + HEADER.size
+        columns = {}
+        for name, code in COLUMNS:
+            column = struct.Struct(f"<{count}{code}")
+            columns[name] = column.unpack_from(data, position)
+            position += column.size
+        yield t0, columns
+
+
+class TelemetrySampler(threading.Thread):
+    """Reads the IMU and button at a fixed rate into column buffers.
+
+    Only `pressed` is sampled from the button; clicks reach the state
+    machine through button_events.ButtonWatcher.
+    """
+
+    def __init__(self, imu, button, state_fn=lambda: -1, rate=SAMPLE_RATE):
+        super().__init__(daemon=True)
+        self.imu = imu
+        self.button = button
+        self.state_fn = state_fn
+        self.period = 1.0 / rate
+        self.overruns = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self._t0 = None
+        self._t0_ns = 0
+        self._columns = {name: [] for name, _ in COLUMNS}
+
+    def run(self):
+        next_sample = time.monotonic()
+        while not self._stop_event.is_set():
+            self.sample()
+            next_sample += self.period
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                # Fell behind (slow module read); don't burst to catch up
+                self.overruns += 1
+                next_sample = time.monotonic()
+
+    def sample(self):
+        imu = self.imu
+        row = (
+            imu.acceleration_x, imu.acceleration_y, imu.acceleration_z,
+            imu.angular_vel_x, imu.angular_vel_y, imu.angular_vel_z,
+            imu.angle_x, imu.angle_y, imu.angle_z,
+            1 if self.button.pressed else 0,
+            self.state_fn(),
+        )
+        now_ns = time.time_ns()
+        with self._lock:
+            if self._t0 is None:
+                self._t0, self._t0_ns = now_ns / 1e9, now_ns
+            columns = self._columns
+            columns["t_us"].append((now_ns - self._t0_ns) // 1000)
+            for (name, _), value in zip(COLUMNS[1:], row):
+                columns[name].append(value)
+
+    def drain(self):
+        """Encoded batch of everything sampled since the last drain, or None"""
+        with self._lock:
+            if self._t0 is None:
+                return None
+            t0, columns = self._t0, self._columns
+            self._reset()
+        if len(columns["t_us"]) > MAX_BATCH_SAMPLES:
+            # Uploader stalled for minutes; keep the newest samples
+            columns = {name: values[-MAX_BATCH_SAMPLES:] for name, values in columns.items()}
+        return encode_batch(t0, columns)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class TelemetryUploader(threading.Thread):
+    """Ships sampled batches over one keep-alive connection.
+
+    Uploads pause while a speak request is in flight (see speaking()) and
+    are rate limited to UPLOAD_BYTES_PER_S. While the server is unreachable
+    batches queue up to MAX_PENDING_BATCHES, then the oldest are dropped.
+    """
+
+    def __init__(self, base_url, sampler, session_id=None):
+        import requests
+
+        super().__init__(daemon=True)
+        self.session_id = session_id or new_session_id()
+        self.set_base_url(base_url)
+        self.sampler = sampler
+        self.request_error = requests.exceptions.RequestException
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = CONTENT_TYPE
+        self.pending = deque()
+        self.sent_samples = 0
+        self.sent_bytes = 0
+        self.dropped_batches = 0
+        self._speaking = 0
+        self._speak_lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._stop_event = threading.Event()
+
+    def set_base_url(self, base_url):
+        """Point uploads at another server, keeping the session"""
+        self.url = f"{base_url}/telemetry/{self.session_id}"
+
+    @contextmanager
+    def speaking(self):
+        """Holds uploads back for the duration of a speak request"""
+        with self._speak_lock:
+            self._speaking += 1
+            self._idle.clear()
+        try:
+            yield
+        finally:
+            with self._speak_lock:
+                self._speaking -= 1
+                if not self._speaking:
+                    self._idle.set()
+
+    def run(self):
+        while not self._stop_event.wait(FLUSH_INTERVAL):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        batch = self.sampler.drain()
+        if batch:
+            self.pending.append(batch)
+            while len(self.pending) > MAX_PENDING_BATCHES:
+                self.pending.popleft()
+                self.dropped_batches += 1
+
+        while self.pending:
+            # Speak commands go first; wait for them to finish
+            while not self._idle.wait(0.05):
+                if self._stop_event.is_set():
+                    return
+
+            payload, used = [], 0
+            for batch in self.pending:
+                if payload and sum(map(len, payload)) + len(batch) > MAX_REQUEST_BYTES:
+                    break
+                payload.append(batch)
+                used += 1
+            body = b"".join(payload)
+
+            start = time.monotonic()
+            try:
+                response = self.session.post(self.url, data=body, timeout=UPLOAD_TIMEOUT)
+                response.raise_for_status()
+            except self.request_error as e:
+                print(f"Telemetry upload failed, keeping {len(self.pending)} batch(es): {e}")
+                return
+
+            for _ in range(used):
+                self.pending.popleft()
+            self.sent_bytes += len(body)
+            self.sent_samples += sum(count for _, count in batch_spans(body))
+
+            # Stay under the upload budget before sending the next request
+            remaining = len(body) / UPLOAD_BYTES_PER_S - (time.monotonic() - start)
+            if remaining > 0 and self._stop_event.wait(remaining):
+                return
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=UPLOAD_TIMEOUT + 1)
+        self.session.close()
+
+
+def load_session(path):
+    """All samples in a session file as {name: list}, with absolute `time` added"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    samples = {name: [] for name, _ in COLUMNS}
+    samples["time"] = []
+    for t0, columns in iter_batches(data):
+        for name, values in columns.items():
+            samples[name].extend(values)
+        samples["time"].extend(t0 + t_us / 1e6 for t_us in columns["t_us"])
+    return samples
+
+
+def summarize(path, csv_path=None):
+    samples = load_session(path)
+    count = len(samples["time"])
+    if not count:
+        print(f"{path}: no samples")
+        return
+    duration = samples["time"][-1] - samples["time"][0]
+    print(f"{path}: {count} samples over {duration:.1f} s "
+          f"({count / duration if duration else 0:.0f} Hz)")
+    for name in ["acc_x", "acc_y", "acc_z", "gyro_x", "gyro_y", "gyro_z"]:
+        values = sorted(abs(v) for v in samples[name])
+        print(f"  |{name}|  p50={values[count // 2]:.2f}  "
+              f"p99={values[min(count - 1, int(count * 0.99))]:.2f}  max={values[-1]:.2f}")
+
+    if csv_path:
+        names = ["time"] + [name for name, _ in COLUMNS if name != "t_us"]
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            writer.writerows(zip(*(samples[name] for name in names)))
+        print(f"Wrote {csv_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a telemetry session file")
+    parser.add_argument("path")
+    parser.add_argument("--csv", help="also export every sample as CSV")
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        print(f"No such file: {args.path}")
+        sys.exit(1)
+    summarize(args.path, args.csv)
@@ -0,0 +1,76 @@
+"""
+Server discovery over loopback: servers that share a hostname and port
+are still listed separately, and a server answering twice is listed once
+
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discovery
+
+
+class TwinResponders(threading.Thread):
+    """Answers each query as several servers named "raspberrypi" on :8000"""
+
+    def __init__(self, instances):
+        super().__init__(daemon=True)
+        self.instances = instances
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+
+    def run(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except OSError:
+                return
+            query = json.loads(data)
+            for instance in self.instances:
+                reply = {"service": discovery.SERVICE, "version": discovery.PROTOCOL_VERSION,
+                         "nonce": query["nonce"], "port": 8000, "name": "raspberrypi",
+                         "instance": instance}
+                self.sock.sendto(json.dumps(reply).encode("utf-8"), address)
+
+    def close(self):
+        self.sock.close()
+
+
+class DiscoverAllTest(unittest.TestCase):
+    def discover(self, instances):
+        responders = TwinResponders(instances)
+        responders.start()
+        self.addCleanup(responders.close)
+        return discovery.discover_all(timeout=1.0, settle=0.2, targets=["127.0.0.1"],
+                                      port=responders.port)
+
+    def test_same_hostname_and_port_are_distinct_servers(self):
+        self.assertEqual(len(self.discover(["a" * 32, "b" * 32])), 2)
+
+    def test_repeated_replies_from_one_server_count_once(self):
+        self.assertEqual(self.discover(["a" * 32, "a" * 32]), ["http://127.0.0.1:8000"])
+
+    def test_responder_reply_carries_its_instance(self):
+        responder = discovery.DiscoveryResponder(8000, port=0, name="raspberrypi")
+        port = responder.sock.getsockname()[1]
+        responder.start()
+        self.addCleanup(responder.close)
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(1.0)
+            sock.sendto(json.dumps({"service": discovery.SERVICE, "nonce": "n"}).encode(),
+                        ("127.0.0.1", port))
+            reply = json.loads(sock.recv(2048))
+        self.assertEqual(reply["instance"], responder.instance)
+
+
+if __name__ == "__main__":
+    unittest.main()
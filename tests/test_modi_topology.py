@@ -0,0 +1,110 @@
+"""
+Warm start through the real SerialportTask / ModiSerialPort stack, with a
+pseudo-terminal standing in for the network module's USB serial port
+
+    python -m unittest discover tests
+"""
+
+import base64
+import json
+import os
+import select
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import modi_topology
+    from serial.serialutil import SerialException
+except ImportError:  # modi_plus / pyserial not installed
+    modi_topology = None
+
+MODULES = [
+    {"type": "network", "id": 0x100, "uuid": 0x2000_0000_0100, "app_version": "1.3.0", "os_version": "1.3.1"},
+    {"type": "imu", "id": 0x200, "uuid": 0x2010_0000_0200, "app_version": "1.3.0", "os_version": "1.3.1"},
+]
+
+
+def assign_id_message(entry):
+    """What a module sends in reply to a find-id request"""
+    body = entry["uuid"].to_bytes(6, "little") + (0).to_bytes(2, "little") * 2
+    return json.dumps({"c": 0x05, "s": entry["id"], "d": 0,
+                       "b": base64.b64encode(body).decode(), "l": len(body)}).encode()
+
+
+class FakeNetworkModule(threading.Thread):
+    """Answers find-id broadcasts on the master side of a pty"""
+
+    def __init__(self, master, modules):
+        super().__init__(daemon=True)
+        self.master = master
+        self.modules = modules
+        self.received = b""
+        self.stopped = False
+
+    def run(self):
+        while not self.stopped:
+            ready, _, _ = select.select([self.master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                return
+            self.received += data
+            if b'"c":8' in data:  # find id
+                for entry in self.modules:
+                    os.write(self.master, assign_id_message(entry))
+
+
+@unittest.skipIf(modi_topology is None or not hasattr(os, "openpty"), "needs modi_plus and a pty")
+class WarmStartTest(unittest.TestCase):
+    def setUp(self):
+        self.master, slave = os.openpty()
+        self.port = os.ttyname(slave)
+        self.addCleanup(os.close, slave)
+        self.addCleanup(os.close, self.master)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        topology_file = os.path.join(directory.name, "modi_topology.json")
+        with open(topology_file, "w") as f:
+            json.dump({"port": self.port, "modules": MODULES, "saved_at": time.time()}, f)
+
+        patches = [
+            mock.patch.object(modi_topology, "TOPOLOGY_FILE", topology_file),
+            # The pty has no MODI+ USB ids; everything past the port scan is real
+            mock.patch.object(modi_topology, "list_modi_ports", return_value=[self.port]),
+            mock.patch.object(modi_topology, "_cold_connect",
+                              side_effect=AssertionError("fell back to a cold start")),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_cached_port_is_opened_and_modules_match(self):
+        module = FakeNetworkModule(self.master, MODULES)
+        module.start()
+        self.addCleanup(setattr, module, "stopped", True)
+
+        hardware = modi_topology.connect_modules(("imu",))
+        self.addCleanup(hardware.bundle.close)
+
+        self.assertEqual(hardware.mode, "warm")
+        self.assertEqual(hardware["imu"].id, 0x200)
+        self.assertEqual(hardware.bundle._connection.bus._port, self.port)
+        self.assertIn(b'"c":8', module.received)
+
+    def test_unlisted_port_is_refused(self):
+        with mock.patch.object(modi_topology, "list_modi_ports", return_value=[]):
+            with self.assertRaises(SerialException):
+                modi_topology._warm_connect(modi_topology.load_topology(), ("imu",), ())
+
+
+if __name__ == "__main__":
+    unittest.main()
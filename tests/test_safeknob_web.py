@@ -0,0 +1,215 @@
+"""
+SafeKnob dashboard: ingest validation of malformed columns, the live
+event stream and cursor pagination over shared timestamps
+
+    python -m unittest discover tests
+"""
+
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import safeknob_web
+    from fastapi.testclient import TestClient
+except ImportError:  # fastapi / numpy not installed
+    safeknob_web = None
+
+NOW = 1_700_000_000.0
+
+
+def payload(**columns):
+    """Two good readings, with any column replaced"""
+    body = {
+        "door": ["door-1", "door-2"],
+        "timestamp": [NOW - 2, NOW - 1],
+        "temperature": [21.5, 22],
+        "light_level": [40, 41.5],
+        "safety_level": ["safe", "warning"],
+    }
+    body.update(columns)
+    return body
+
+
+@unittest.skipIf(safeknob_web is None, "needs fastapi and numpy")
+class ValidateReadingsTest(unittest.TestCase):
+    def assertRejected(self, body, rows):
+        entries, rejected = safeknob_web.validate_readings(body, NOW)
+        self.assertEqual(rejected, rows)
+        self.assertEqual(len(entries), 2 - len(rows))
+
+    def test_good_rows_are_accepted(self):
+        entries, rejected = safeknob_web.validate_readings(payload(), NOW)
+        self.assertEqual(rejected, [])
+        self.assertEqual([entry["door"] for entry in entries], ["door-1", "door-2"])
+        self.assertEqual(entries[1]["temperature"], 22.0)
+
+    def test_nested_rows_are_rejected(self):
+        self.assertRejected(payload(timestamp=[[NOW - 2], [NOW - 1]]), [0, 1])
+        self.assertRejected(payload(temperature=[[21.5], 22]), [0])
+        self.assertRejected(payload(safety_level=[["safe"], ["safe"]]), [0, 1])
+        self.assertRejected(payload(safety_level=["safe", {"level": "safe"}]), [1])
+        self.assertRejected(payload(door=[["door-1"], "door-2"]), [0])
+
+    def test_strings_and_bools_are_not_numbers(self):
+        self.assertRejected(payload(temperature=["20", 22]), [0])
+        self.assertRejected(payload(light_level=[40, True]), [1])
+        self.assertRejected(payload(timestamp=[False, NOW - 1]), [0])
+        self.assertRejected(payload(temperature=[None, 10 ** 400]), [0, 1])
+
+    def test_ingest_endpoint_rejects_instead_of_failing(self):
+        cache = safeknob_web.LogCache(None)
+        with mock.patch.object(safeknob_web, "INGEST_TOKENS", {"secret"}), \
+                mock.patch.object(safeknob_web, "log_cache", cache):
+            response = TestClient(safeknob_web.app).post(
+                "/api/ingest",
+                json=payload(timestamp=[time.time()] * 2, safety_level=[["safe"], ["safe"]]),
+                headers={"Authorization": "Bearer secret"},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["accepted"], 0)
+        self.assertEqual(response.json()["rejected_rows"], [0, 1])
+
+
+def reading(door, timestamp, temperature, level):
+    return {"door": door, "timestamp": timestamp, "temperature": temperature, "light_level": 50,
+            "safety_level": level, "readable_time": str(timestamp)}
+
+
+@unittest.skipIf(safeknob_web is None, "needs fastapi and numpy")
+class WatchLogTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Remote readings only; the local log file never appears
+        self.cache = safeknob_web.LogCache(os.path.join(directory.name, "safeknob_log.json"))
+
+    def stream(self, cache, *batches):
+        """Events published by watch_log while `batches` are ingested one per tick"""
+        hub = safeknob_web.EventHub(queue_size=1000)
+
+        async def run():
+            queue = hub.subscribe()
+            watcher = asyncio.create_task(safeknob_web.watch_log())
+            for batch in batches:
+                await asyncio.sleep(0)  # let watch_log take its baseline first
+                cache.ingest(batch)
+                await asyncio.sleep(safeknob_web.WATCH_INTERVAL * 2)
+            watcher.cancel()
+            events = []
+            while not queue.empty():
+                event, data = queue.get_nowait().decode("utf-8").split("\n")[:2]
+                events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+            return events
+
+        with mock.patch.object(safeknob_web, "log_cache", cache), \
+                mock.patch.object(safeknob_web, "event_hub", hub):
+            return asyncio.run(run())
+
+    def test_status_follows_temperature_at_the_same_level(self):
+        self.cache.ingest([reading("door-1", NOW, 60.0, "danger")])
+        events = self.stream(self.cache, [reading("door-1", NOW + 1, 90.0, "danger")])
+
+        statuses = [data for event, data in events if event == "status"]
+        self.assertEqual(len(statuses), 1)
+        self.assertEqual(statuses[0]["temperature"], 90.0)
+        self.assertEqual(statuses[0]["safety_level"], "danger")
+
+
+    def test_late_batch_from_another_door_is_streamed(self):
+        self.cache.ingest([reading("door-1", NOW, 20.0, "safe")])
+        events = self.stream(
+            self.cache,
+            [reading("door-1", NOW + 10, 21.0, "safe")],
+            # Flushed later but read earlier than door-1's newest reading
+            [reading("door-2", NOW + 5, 22.0, "safe"), reading("door-2", NOW + 6, 23.0, "safe")],
+        )
+
+        streamed = [(data["door"], data["timestamp"]) for event, data in events if event == "reading"]
+        self.assertEqual(streamed, [("door-1", NOW + 10), ("door-2", NOW + 5), ("door-2", NOW + 6)])
+
+
+@unittest.skipIf(safeknob_web is None, "needs fastapi and numpy")
+class CursorPaginationTest(unittest.TestCase):
+    """Pages must cover every match exactly once, even when a page ends
+    inside a run of equal timestamps (readings of one ingest batch)"""
+
+    def make_cache(self, timestamps):
+        cache = safeknob_web.LogCache(None)
+        levels = ["safe", "warning", "danger"]
+        cache.ingest([reading(f"door-{i}", timestamp, 20.0 + i, levels[i % 3])
+                      for i, timestamp in enumerate(timestamps)])
+        return cache
+
+    def walk(self, cache, level, limit):
+        """Every page newest-first through encoded cursors; returns the doors seen"""
+        seen, before = [], None
+        for _ in range(len(cache.logs) + 2):
+            entries, next_before = cache.query(level=level, limit=limit, before=before)
+            self.assertLessEqual(len(entries), limit)
+            seen = [entry["door"] for entry in entries] + seen
+            if next_before is None:
+                return seen
+            before = safeknob_web.decode_cursor(safeknob_web.encode_cursor(next_before))
+        self.fail("pagination did not terminate")
+
+    def expected(self, cache, level):
+        return [entry["door"] for entry in cache.logs if level is None or entry["safety_level"] == level]
+
+    def test_pages_split_inside_equal_timestamps(self):
+        cache = self.make_cache([NOW, NOW + 1, NOW + 1, NOW + 1, NOW + 2, NOW + 2, NOW + 3])
+        for level in (None, "safe", "warning", "danger"):
+            for limit in range(1, 9):
+                with self.subTest(level=level, limit=limit):
+                    self.assertEqual(self.walk(cache, level, limit), self.expected(cache, level))
+
+    def test_randomized_logs(self):
+        rng = random.Random(28)
+        for trial in range(200):
+            timestamps = sorted(NOW + rng.randrange(6) for _ in range(rng.randrange(1, 25)))
+            cache = self.make_cache(timestamps)
+            level = rng.choice([None, "safe", "warning", "danger"])
+            limit = rng.randrange(1, 6)
+            with self.subTest(trial=trial):
+                self.assertEqual(self.walk(cache, level, limit), self.expected(cache, level))
+
+    def test_api_logs_follows_next_cursor_header(self):
+        cache = self.make_cache([NOW, NOW + 1, NOW + 1, NOW + 1, NOW + 2])
+        cache.refresh = lambda: None  # remote readings only
+        client = TestClient(safeknob_web.app)
+        seen, url = [], "/api/logs?limit=2"
+        with mock.patch.object(safeknob_web, "log_cache", cache):
+            while url:
+                response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                seen = [entry["door"] for entry in response.json()] + seen
+                cursor = response.headers.get("X-Next-Cursor")
+                url = f"/api/logs?limit=2&cursor={cursor}" if cursor else None
+        self.assertEqual(seen, self.expected(cache, None))
+
+    def test_cursor_without_skip_keeps_its_old_meaning(self):
+        cache = self.make_cache([NOW, NOW + 1, NOW + 1, NOW + 2])
+        cursor = base64.urlsafe_b64encode(json.dumps({"before": NOW + 1}).encode()).decode()
+        before = safeknob_web.decode_cursor(cursor)
+        self.assertEqual(before, (NOW + 1, None))
+        entries, _ = cache.query(before=before)
+        self.assertEqual([entry["timestamp"] for entry in entries], [NOW])
+
+    def test_bad_skip_is_rejected(self):
+        for skip in (-1, 1.5, "2"):
+            cursor = base64.urlsafe_b64encode(json.dumps({"before": NOW, "skip": skip}).encode())
+            with self.assertRaises(safeknob_web.HTTPException):
+                safeknob_web.decode_cursor(cursor.decode())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Speak server pool: only servers that answered a probe are reported as
+confirmed, so a dead cached URL never renews itself
+
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import server_pool
+except ImportError:  # requests not installed
+    server_pool = None
+
+DEAD_URL = "http://127.0.0.1:9"
+
+
+class ProbeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({"status": "ok", "time": time.time()}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipIf(server_pool is None, "needs requests")
+class ConfirmedServersTest(unittest.TestCase):
+    def setUp(self):
+        self.changes = []
+
+    def pool(self, urls):
+        return server_pool.ServerPool(urls, on_change=self.changes.append)
+
+    def test_dead_server_is_never_reported(self):
+        pool = self.pool([DEAD_URL])
+        pool.probe_all()
+        # Still routed to optimistically after one failure, but not confirmed
+        self.assertTrue(pool.servers[0].healthy)
+        self.assertEqual(self.changes, [])
+        pool.probe_all()
+        self.assertEqual(self.changes, [])
+
+    def test_live_server_is_reported_without_the_dead_one(self):
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), ProbeHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        self.addCleanup(httpd.server_close)
+        self.addCleanup(httpd.shutdown)
+        live_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+        pool = self.pool([DEAD_URL, live_url])
+        pool.probe_all()
+        self.assertEqual(self.changes, [[live_url]])
+        pool.probe_all()
+        self.assertEqual(self.changes, [[live_url]])
+
+
+if __name__ == "__main__":
+    unittest.main()
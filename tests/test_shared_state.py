@@ -0,0 +1,107 @@
+"""
+Shared-memory seqlock: a reader never accepts a half-written snapshot,
+whether it looks between two stores of one publish or races a writer
+in another process
+
+    python -m unittest discover tests
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shared_state
+
+SEGMENT_SIZE = 64 * 1024
+
+
+def body(n):
+    """Self-describing payload: its length can be checked from its content"""
+    return b"[" + str(n).encode().rjust(8, b"0") + b"," + b"7" * n + b"]"
+
+
+def is_whole(logs_body):
+    return logs_body == body(int(logs_body[1:9]))
+
+
+def publish_forever(writer, stop):
+    n = 0
+    while not stop.is_set():
+        n = (n + 997) % 5000
+        writer.publish(body(n))
+
+
+class SeqlockTest(unittest.TestCase):
+    def setUp(self):
+        self.name = f"gfire_test_{uuid.uuid4().hex[:12]}"
+        self.writer = shared_state.SharedStateWriter(self.name, size=SEGMENT_SIZE)
+        self.addCleanup(self.writer.close)
+        self.reader = shared_state.SharedStateReader(self.name)
+        self.addCleanup(self.reader.close)
+
+    def test_nothing_published_yet(self):
+        self.assertEqual(self.reader.seq(), 0)
+        self.assertIsNone(self.reader.read())
+
+    def test_round_trip(self):
+        self.assertTrue(self.writer.publish(body(3)))
+        self.assertEqual(self.reader.read(), (2, body(3)))
+        self.assertTrue(self.writer.publish(body(1)))
+        self.assertEqual(self.reader.read(), (4, body(1)))
+
+    def test_oversized_payload_is_refused(self):
+        self.assertFalse(self.writer.publish(b"x" * SEGMENT_SIZE))
+        self.assertEqual(self.reader.seq(), 0)
+
+    def test_read_between_every_store_of_a_publish(self):
+        old, new = body(200), body(20)  # a stale length over the new payload would tear
+        self.writer.publish(old)
+        snapshots = []
+
+        def trace(frame, event, arg):
+            if frame.f_code is not shared_state.SharedStateWriter.publish.__code__:
+                return None
+            if event == "line":
+                snapshots.append(self.reader.read())
+            return trace
+
+        sys.settrace(trace)
+        try:
+            self.writer.publish(new)
+        finally:
+            sys.settrace(None)
+        snapshots.append(self.reader.read())
+
+        self.assertGreater(len(snapshots), 5)
+        for snapshot in snapshots:
+            self.assertIn(snapshot, (None, (2, old), (4, new)))
+        self.assertEqual(snapshots[-1], (4, new))
+
+    def test_reader_racing_a_writer_process(self):
+        context = multiprocessing.get_context("spawn")  # other tests leave threads running
+        stop = context.Event()
+        writer = context.Process(target=publish_forever, args=(self.writer, stop))
+        writer.start()
+        self.addCleanup(writer.join, 5)
+        self.addCleanup(stop.set)
+
+        reads = 0
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            snapshot = self.reader.read()
+            if snapshot is None:
+                continue
+            seq, logs_body = snapshot
+            self.assertEqual(seq % 2, 0)
+            self.assertTrue(is_whole(logs_body), f"torn snapshot at seq {seq}")
+            reads += 1
+        self.assertGreater(reads, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
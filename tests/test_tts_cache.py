@@ -0,0 +1,90 @@
+"""
+SpeechCache single-flight: concurrent callers for the same text share a
+synthesis only when they want the same kind of result
+
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tts_cache
+
+TEXT = "3번 문 온도 62도"
+
+
+class GatedEngine(tts_cache.OfflineEngine):
+    """Holds the synthesis of TEXT until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def synthesize(self, text, lang):
+        if text == TEXT:
+            self.started.set()
+            self.release.wait(5)
+        return super().synthesize(text, lang)
+
+
+class SingleFlightKeysTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.engine = GatedEngine()
+        self.addCleanup(self.engine.release.set)
+        self.cache = tts_cache.SpeechCache(self.engine, directory=directory.name)
+
+    def test_template_file_does_not_join_a_plain_audio_flight(self):
+        results = {}
+
+        def plain():
+            results["plain"] = self.cache.audio_file(TEXT)
+
+        def template():
+            results["template"] = self.cache.template_file(
+                tts_cache.TEMPLATES["door_temperature"], {"door": 3, "temperature": 62}
+            )
+
+        first = threading.Thread(target=plain)
+        first.start()
+        self.assertTrue(self.engine.started.wait(5))
+        second = threading.Thread(target=template)
+        second.start()
+        # Assembled from fragments, so it must not wait for the gated synthesis
+        second.join(2)
+        template_alive = second.is_alive()
+        self.engine.release.set()
+        first.join(5)
+        second.join(5)
+
+        self.assertFalse(template_alive, "template_file waited on the audio() flight")
+        path, text = results["template"]
+        self.assertEqual(text, TEXT)
+        self.assertIsInstance(path, str)
+        self.assertTrue(os.path.isfile(path))
+        self.assertTrue(os.path.isfile(results["plain"]))
+
+    def test_concurrent_audio_calls_synthesize_once(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.audio(TEXT)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(self.engine.started.wait(5))
+        self.engine.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.cache.stats["syntheses"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,333 @@
+"""
+G-FIRE Dynamic TTS
+On-demand speech synthesis with a two-tier cache: an in-memory LRU of
+audio bytes in front of a size-capped on-disk LRU of playable files.
+Identical concurrent requests share one synthesis, and templates are
+assembled from cached fragments so repeated announcements skip the
+engine entirely.
+"""
+
+import hashlib
+import io
+import math
+import os
+import struct
+import threading
+import wave
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join("tts_audio", "cache")
+MEMORY_CACHE_BYTES = int(os.environ.get("GFIRE_TTS_MEMORY_CACHE_MB", "16")) * 1024 * 1024
+DISK_CACHE_BYTES = int(os.environ.get("GFIRE_TTS_DISK_CACHE_MB", "64")) * 1024 * 1024
+
+# Announcement templates; static text between slots is pre-rendered once
+TEMPLATES = {
+    "door_temperature": "{door}번 문 온도 {temperature}도",
+    "door_danger": "{door}번 문 위험! 다른 출구로 대피하세요.",
+    "floor_evacuate": "{floor}층 화재 발생. 계단으로 대피하세요.",
+}
+# Slot values common enough to pre-render at startup
+PRERENDER_SLOTS = {
+    "door": [str(n) for n in range(1, 11)],
+    "floor": [str(n) for n in range(1, 11)],
+}
+
+
+class GTTSEngine:
+    """Google TTS; MP3 frames can be concatenated directly"""
+    name = "gtts"
+    extension = ".mp3"
+
+    def synthesize(self, text, lang):
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def join(self, chunks):
+        return b"".join(chunks)
+
+
+class OfflineEngine:
+    """Deterministic stand-in that renders a short tone per character (WAV)"""
+    name = "offline"
+    extension = ".wav"
+    sample_rate = 16000
+
+    def synthesize(self, text, lang):
+        frequency = 300 + int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:4], 16) % 500
+        frame_count = int(self.sample_rate * min(0.04 * len(text), 3.0))
+        frames = b"".join(
+            struct.pack("<h", int(8000 * math.sin(2 * math.pi * frequency * i / self.sample_rate)))
+            for i in range(frame_count)
+        )
+        return self._wav(frames)
+
+    def join(self, chunks):
+        frames = []
+        for chunk in chunks:
+            with wave.open(io.BytesIO(chunk), 'rb') as wav:
+                frames.append(wav.readframes(wav.getnframes()))
+        return self._wav(b"".join(frames))
+
+    def _wav(self, frames):
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(frames)
+        return buffer.getvalue()
+
+
+ENGINES = {"gtts": GTTSEngine, "offline": OfflineEngine}
+
+
+class MemoryLRU:
+    """Byte-budgeted LRU of audio blobs"""
+
+    def __init__(self, capacity_bytes):
+        self.capacity = capacity_bytes
+        self.size = 0
+        self.items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self.items.get(key)
+            if data is not None:
+                self.items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.capacity:
+            return
+        with self._lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.items[key] = data
+            self.size += len(data)
+            while self.size > self.capacity:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class DiskLRU:
+    """Size-capped directory of audio files, evicting least recently used"""
+
+    def __init__(self, directory, capacity_bytes):
+        self.directory = directory
+        self.capacity = capacity_bytes
+        self.size = 0
+        self.files = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # Rebuild the LRU order from modification times left by earlier runs
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                st = os.stat(path)
+                entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self.files[name] = size
+            self.size += size
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get(self, name):
+        """Path of a cached file (marked as recently used), or None"""
+        with self._lock:
+            if name not in self.files:
+                return None
+            self.files.move_to_end(name)
+        path = self.path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.size -= self.files.pop(name, 0)
+            return None
+        return path
+
+    def read(self, name):
+        path = self.get(name)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put(self, name, data):
+        path = self.path(name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.size -= self.files.pop(name, 0)
+            self.files[name] = len(data)
+            self.size += len(data)
+            while self.size > self.capacity and len(self.files) > 1:
+                evicted, evicted_size = self.files.popitem(last=False)
+                self.size -= evicted_size
+                try:
+                    os.unlink(self.path(evicted))
+                except FileNotFoundError:
+                    pass
+        return path
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers get its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+class SpeechCache:
+    """Text -> playable audio file, synthesizing only on a full cache miss"""
+
+    def __init__(self, engine=None, directory=CACHE_DIR,
+                 memory_bytes=MEMORY_CACHE_BYTES, disk_bytes=DISK_CACHE_BYTES):
+        if engine is None:
+            engine = ENGINES[os.environ.get("GFIRE_TTS_ENGINE", "gtts")]()
+        self.engine = engine
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = DiskLRU(directory, disk_bytes)
+        self.flight = SingleFlight()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "syntheses": 0, "joins": 0}
+        self._stats_lock = threading.Lock()  # counted from threadpool threads
+
+    def _name(self, text, lang):
+        digest = hashlib.sha256(f"{self.engine.name}|{lang}|{text}".encode("utf-8")).hexdigest()
+        return digest[:32] + self.engine.extension
+
+    def _count(self, stat):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _lookup(self, name):
+        data = self.memory.get(name)
+        if data is not None:
+            self._count("memory_hits")
+            return data
+        data = self.disk.read(name)
+        if data is not None:
+            self._count("disk_hits")
+            self.memory.put(name, data)
+        return data
+
+    def audio(self, text, lang="ko"):
+        """Audio bytes for `text`, synthesized at most once across threads"""
+        name = self._name(text, lang)
+        data = self._lookup(name)
+        if data is not None:
+            return data
+
+        def synthesize():
+            cached = self._lookup(name)
+            if cached is not None:
+                return cached
+            result = self.engine.synthesize(text, lang)
+            self._count("syntheses")
+            self.memory.put(name, result)
+            self.disk.put(name, result)
+            return result
+
+        # Keys are namespaced: this flight yields bytes, template_file's a path
+        return self.flight.do(("audio", name), synthesize)
+
+    def audio_file(self, text, lang="ko"):
+        """Path of a playable file for `text`"""
+        name = self._name(text, lang)
+        path = self.disk.get(name)
+        if path is not None:
+            self._count("disk_hits")
+            return path
+        # Memory hit whose file was evicted: write it back without resynthesizing
+        return self.disk.put(name, self.audio(text, lang))
+
+    def template_file(self, template, slots, lang="ko"):
+        """Path of a playable file for a filled template, joined from fragments"""
+        text = template.format(**slots)
+        name = self._name(text, lang)
+        path = self.disk.get(name)
+        if path is not None:
+            self._count("disk_hits")
+            return path, text
+
+        def assemble():
+            data = self._lookup(name)
+            if data is None:
+                fragments = [self.audio(fragment, lang)
+                             for fragment in split_template(template, slots)]
+                data = self.engine.join(fragments)
+                self._count("joins")
+                self.memory.put(name, data)
+            return self.disk.put(name, data)
+
+        return self.flight.do(("file", name), assemble), text
+
+    def prerender(self, lang="ko"):
+        """Synthesize the static pieces of every template and common slot values"""
+        for template in TEMPLATES.values():
+            for fragment, is_slot in parse_template(template):
+                if not is_slot:
+                    self.audio(fragment, lang)
+        for values in PRERENDER_SLOTS.values():
+            for value in values:
+                self.audio(value, lang)
+
+
+def parse_template(template):
+    """[(text, is_slot)] for '{door}번 문 ' -> [('door', True), ('번 문', False)]"""
+    parts = []
+    rest = template
+    while rest:
+        start = rest.find("{")
+        if start == -1:
+            parts.append((rest, False))
+            break
+        if start:
+            parts.append((rest[:start], False))
+        end = rest.index("}", start)
+        parts.append((rest[start + 1:end], True))
+        rest = rest[end + 1:]
+    return [(text if is_slot else text.strip(), is_slot)
+            for text, is_slot in parts if is_slot or text.strip()]
+
+
+def split_template(template, slots):
+    """Fragments to synthesize for a filled template, in speaking order"""
+    return [str(slots[text]) if is_slot else text
+            for text, is_slot in parse_template(template)]